@@ -0,0 +1,79 @@
+# batch.py
+# Headless entry point: analyzes every symbol/timeframe combination and writes one report.
+
+import os
+import sys
+import logging
+import argparse
+from dotenv import load_dotenv
+
+from core.pipeline import AnalysisPipeline, LOOKBACK_DAYS
+from core.rollups import RESOLUTIONS
+from core.ticks import TICK_MEASUREMENT
+from core.batch import build_jobs, run_batch, write_report
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the Griffin broker analysis for all symbols and timeframes.")
+    parser.add_argument("--output", required=True, help="Consolidated result file (.parquet or .csv).")
+    parser.add_argument("--data-path", help="Read candles from this Parquet/Arrow/CSV file or folder instead of InfluxDB.")
+    parser.add_argument("--symbols", nargs="+", help="Base symbols to analyze (default: all).")
+    parser.add_argument("--timeframes", nargs="+", help="Timeframes to analyze (default: all).")
+    parser.add_argument("--brokers", nargs="+", help="Brokers to include (default: all).")
+    parser.add_argument("--symbol-suffix", nargs="+", help="Extra symbol suffixes to strip when grouping variants (e.g. .cash).")
+    parser.add_argument("--min-points", type=int, default=240, help="Minimum data points per broker.")
+    parser.add_argument("--lookback-days", type=int, default=LOOKBACK_DAYS, help="Days of history to analyze.")
+    parser.add_argument("--resolution", choices=["auto", *RESOLUTIONS], default="auto",
+                        help="Candle resolution (default: the coarsest that still meets --min-points).")
+    parser.add_argument("--use-rollups", action="store_true", help="Read the rollup buckets created by setup_rollups.py.")
+    parser.add_argument("--processing-mode", choices=["client", "streaming", "sketch", "server"], default="client")
+    parser.add_argument("--consensus-features", action="store_true",
+                        help="Add cross-broker consensus features (client processing mode only).")
+    parser.add_argument("--tick-features", action="store_true", help="Add spread and quote-stability features from bid/ask ticks.")
+    parser.add_argument("--tick-measurement", default=os.getenv("GRIFFIN_TICK_MEASUREMENT", TICK_MEASUREMENT),
+                        help="Measurement holding the bid/ask ticks.")
+    parser.add_argument("--float32-prices", action="store_true", help="Keep candle prices as float32 to halve their memory.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count).")
+    parser.add_argument("--max-queries", type=int, default=4, help="Maximum concurrent InfluxDB queries.")
+    parser.add_argument("--recompute", action="store_true", help="Ignore stored results of identical analyses (new results are still stored).")
+    parser.add_argument("--profile-log", help="Append per-stage timings of every analysis to this JSON Lines file.")
+    parser.add_argument("--profile-memory", action="store_true", help="Also trace peak memory per stage (slower).")
+    return parser.parse_args()
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    load_dotenv()
+    args = parse_args()
+
+    settings = {
+        "url": os.getenv("INFLUX_URL", ""), "token": os.getenv("INFLUX_TOKEN", ""),
+        "org": os.getenv("INFLUX_ORG", ""), "bucket": os.getenv("INFLUX_BUCKET", ""),
+        "data_path": args.data_path or os.getenv("GRIFFIN_DATA_PATH"),
+        "min_points": args.min_points, "min_brokers": 2,
+        "lookback_days": args.lookback_days, "resolution": args.resolution, "use_rollups": args.use_rollups,
+        "processing_mode": args.processing_mode, "consensus_features": args.consensus_features,
+        "tick_features": args.tick_features, "tick_measurement": args.tick_measurement, "cache_dir": os.getenv("GRIFFIN_CACHE_DIR"),
+        "price_dtype": "float32" if args.float32_prices else "float64",
+        "profile_log": args.profile_log or os.getenv("GRIFFIN_PROFILE_LOG"), "profile_memory": args.profile_memory,
+        "reuse_results": not args.recompute
+    }
+    if os.getenv("GRIFFIN_RESULT_STORE"):
+        settings["result_store"] = os.getenv("GRIFFIN_RESULT_STORE")
+    if args.symbol_suffix:
+        settings["symbol_suffixes"] = args.symbol_suffix
+    metadata = AnalysisPipeline().load_metadata(settings)
+    settings["brokers"] = args.brokers or sorted(metadata['brokers'])
+    settings["broker_universe"] = metadata['brokers']
+
+    jobs = build_jobs(settings, metadata, args.symbols, args.timeframes)
+    logging.info(f"Running {len(jobs)} analyses on up to {args.workers or os.cpu_count()} processes...")
+    report, failures = run_batch(jobs, max_workers=args.workers, max_queries=args.max_queries)
+
+    if report.empty:
+        logging.error("No analysis produced a result.")
+        return 1
+    write_report(report, args.output)
+    logging.info(f"Wrote {len(report)} rows to {args.output} ({len(failures)} of {len(jobs)} combinations skipped).")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
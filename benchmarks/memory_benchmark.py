@@ -0,0 +1,93 @@
+# benchmarks/memory_benchmark.py
+# Peak memory of loading and featurizing candles: pandas frame pipeline vs. CandleStore.
+
+import sys
+import argparse
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+from core.candle_store import CandleStore
+from core.ingest import OHLC_COLUMNS, CHUNK_ROWS
+from benchmarks.synthetic import generate_candles
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare peak memory of the frame-based and the compact candle pipeline.")
+    parser.add_argument("--brokers", type=int, default=10)
+    parser.add_argument("--candles", type=int, nargs="+", default=[10_000, 100_000, 1_000_000], help="Candles per broker.")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+def make_chunks(candles_df, brokers):
+    """Splits the synthetic candles into typed chunks shaped like the streamed query output."""
+    chunks = []
+    for start in range(0, len(candles_df), CHUNK_ROWS):
+        part = candles_df.iloc[start:start + CHUNK_ROWS]
+        chunk = pd.DataFrame({'_time': part['_time'].array.copy(), 'broker': pd.Categorical(part['broker'], categories=brokers)})
+        for col in OHLC_COLUMNS:
+            chunk[col] = part[col].to_numpy()
+        chunks.append(chunk)
+    return chunks
+
+def load_frame(chunks, brokers, since):
+    """The previous frame-based load: concatenate, deduplicate and filter the chunks."""
+    df = pd.concat(chunks, ignore_index=True)
+    df['broker'] = pd.Categorical(df['broker'], categories=brokers)
+    df.drop_duplicates(subset=['broker', '_time'], keep='last', inplace=True)
+    return df[df['_time'] >= since].reset_index(drop=True)
+
+def frame_features(df, min_points):
+    """The previous grouped feature pass over the frame."""
+    df = df.sort_values(['broker', '_time'], kind='stable')
+    prev_close = df.groupby('broker', sort=False, observed=True)['close'].shift(1)
+    gap = np.abs(df['open'] - prev_close)
+    spike = (df['high'] - df['low']) / (np.abs(df['open'] - df['close']) + 1e-9)
+    grouped = pd.DataFrame({'broker': df['broker'], 'gap': gap, 'spike': spike}).groupby('broker', sort=False, observed=True)
+    features = grouped.agg(Gap_Median=('gap', 'median'), Spike_Median=('spike', 'median'), Spike_Max=('spike', 'max'), Gap_Max=('gap', 'max'))
+    features = features[grouped.size() >= min_points]
+    features.index = features.index.astype(str)
+    return features
+
+def measure(fn, *args, **kwargs):
+    """Returns (result, MB still allocated by the call, peak MB allocated during it) on top of what was live before."""
+    tracemalloc.start()
+    try:
+        result = fn(*args, **kwargs)
+        current, peak = tracemalloc.get_traced_memory()
+        return result, current / 2**20, peak / 2**20
+    finally:
+        tracemalloc.stop()
+
+def profile(load, features, chunks, min_points):
+    """Peak memory of loading then featurizing; the table stays alive while the features are computed."""
+    table, table_mb, load_peak = measure(load, chunks)
+    result, _, features_peak = measure(features, table, min_points)
+    return result, {'table_mb': table_mb, 'load_peak_mb': load_peak, 'features_peak_mb': features_peak,
+                    'peak_mb': max(load_peak, table_mb + features_peak)}
+
+def main():
+    args = parse_args()
+    rows = []
+    for candles in args.candles:
+        candles_df = generate_candles(brokers=args.brokers, candles=candles, seed=args.seed)
+        brokers = sorted(candles_df['broker'].unique())
+        chunks = make_chunks(candles_df, brokers)
+        del candles_df
+        since = pd.Timestamp.now(tz='UTC') - pd.Timedelta(days=31)
+        input_mb = sum(c.memory_usage(deep=True).sum() for c in chunks) / 2**20
+
+        frame_result, frame = profile(lambda c: load_frame(c, brokers, since), frame_features, chunks, 100)
+        store_result, store = profile(lambda c: CandleStore.from_frames(c, brokers, since=since), CandleStore.features, chunks, 100)
+        _, compact = profile(lambda c: CandleStore.from_frames(c, brokers, 'float32', since=since), CandleStore.features, chunks, 100)
+        pd.testing.assert_frame_equal(frame_result.sort_index(), store_result.sort_index(), check_exact=False, check_names=False)
+
+        for name, stats in [('frame', frame), ('store', store), ('store_float32', compact)]:
+            rows.append({'candles': args.brokers * candles, 'chunks_mb': input_mb, 'pipeline': name, **stats,
+                         'peak_ratio': frame['peak_mb'] / stats['peak_mb']})
+        print(f"{args.brokers * candles:,} candles: peak {frame['peak_mb']:.1f} MB (frame) vs {store['peak_mb']:.1f} MB (store)")
+    print()
+    print(pd.DataFrame(rows).round(2).to_string(index=False))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+# benchmarks/run_benchmarks.py
+# Times the full analysis pipeline on synthetic data across broker and candle counts.
+
+import sys
+import time
+import logging
+import argparse
+import pandas as pd
+
+from core.pipeline import AnalysisPipeline
+from core.profiling import write_profile_jsonl
+from benchmarks.synthetic import generate_candles, LocalConnectionPool
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the Griffin analysis pipeline on synthetic OHLC data.")
+    parser.add_argument("--brokers", type=int, nargs="+", default=[10, 30, 100, 300, 1000], help="Broker counts of the broker sweep.")
+    parser.add_argument("--candles", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000], help="Candles per broker of the candle sweep.")
+    parser.add_argument("--sweep-candles", type=int, default=1_000, help="Candles per broker during the broker sweep.")
+    parser.add_argument("--sweep-brokers", type=int, default=2, help="Brokers during the candle sweep.")
+    parser.add_argument("--modes", nargs="+", choices=["client", "streaming", "sketch"], default=["client"])
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per point; every run is reported.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--compute-pool", action="store_true", help="Run features and clustering in a separate process, as the GUI does.")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the second, memory-traced run of every point.")
+    parser.add_argument("--output", help="Append the per-stage results to this JSON Lines file.")
+    return parser.parse_args()
+
+def run_point(candles_df, mode, compute_pool=None, trace_memory=False):
+    """
+    Runs metadata loading and one analysis over the given candles and returns the per-stage
+    profile with `rows_per_s` plus an `end_to_end` row for the whole run.
+    """
+    candles = candles_df.groupby('broker').size().min()
+    pipeline = AnalysisPipeline()
+    pipeline.connections = LocalConnectionPool(candles_df)
+    pipeline.compute_pool = compute_pool
+    base = {"url": "", "token": "", "org": "", "bucket": "benchmark", "symbol_registry": None, "result_store": None}
+
+    started = time.perf_counter()
+    metadata = pipeline.load_metadata(base)
+    settings = {
+        **base, "brokers": sorted(metadata['brokers']), "base_symbol": "EURUSD", "symbol_map": metadata['symbol_map'],
+        "timeframe": metadata['timeframes'][0], "min_points": min(240, candles // 2), "min_brokers": 2,
+        "processing_mode": mode, "use_cache": False, "profile_memory": trace_memory
+    }
+    pipeline.analyze(settings)
+    total = time.perf_counter() - started
+
+    profile_df = pipeline.profiler.to_frame()
+    profile_df.loc[len(profile_df)] = {'run_id': pipeline.profiler.run_id, 'stage': 'end_to_end', 'wall_s': total, 'rows': len(candles_df)}
+    profile_df['rows_per_s'] = profile_df['rows'].astype(float) / profile_df['wall_s']
+    return profile_df
+
+def main():
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_args()
+    compute_pool = None
+    if args.compute_pool:
+        from core.compute_pool import ComputePool
+        compute_pool = ComputePool()
+
+    points = [(b, args.sweep_candles) for b in args.brokers] + [(args.sweep_brokers, c) for c in args.candles]
+    points = list(dict.fromkeys(points))
+    results = []
+    try:
+        for mode in args.modes:
+            for brokers, candles in points:
+                for repeat in range(args.repeat):
+                    # A new seed per repeat keeps the clustering cache from answering repeated runs.
+                    candles_df = generate_candles(brokers=brokers, candles=candles, seed=args.seed + repeat)
+                    profile_df = run_point(candles_df, mode, compute_pool)
+                    if not args.no_memory:
+                        # Tracing slows the Python-heavy stages down, so timings and memory come from separate runs.
+                        profile_df['peak_mem_mb'] = run_point(candles_df, mode, compute_pool, trace_memory=True)['peak_mem_mb'].to_numpy()
+                    context = {'brokers': brokers, 'candles': candles, 'mode': mode}
+                    if args.output:
+                        write_profile_jsonl(profile_df, args.output, **context)
+                    results.append(profile_df.assign(**context))
+                    total = profile_df.iloc[-1]
+                    print(f"{mode:9s} brokers={brokers:<5d} candles={candles:<8d} {total['wall_s']:8.3f}s  {total['rows_per_s']:12,.0f} candles/s")
+    finally:
+        if compute_pool is not None:
+            compute_pool.shutdown()
+
+    results = pd.concat(results)
+    for value, title in [('wall_s', "Wall time per stage (s)"), ('peak_mem_mb', "Peak traced memory per stage (MB)")]:
+        if results[value].notna().any():
+            summary = results.pivot_table(index=['mode', 'brokers', 'candles'], columns='stage', values=value, aggfunc='median', sort=False)
+            print(f"\n{title}\n{summary.round(3).to_string()}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+# benchmarks/startup_benchmark.py
+# Cold-start time of the desktop app: time to a visible window, time to a usable engine, import breakdown.
+
+import os
+import re
+import sys
+import time
+import argparse
+import subprocess
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Runs in a fresh interpreter and reports each startup milestone on stdout.
+STARTUP_SCRIPT = '''
+import sys
+from PyQt6.QtWidgets import QApplication
+from PyQt6.QtCore import QTimer
+app = QApplication(sys.argv)
+from ui.main_window import MainWindow
+window = MainWindow()
+window.show()
+app.processEvents()
+print("window", flush=True)
+def ready():
+    print("engine", flush=True)
+    window.close()
+    app.quit()
+window.engine_ready.connect(ready)
+QTimer.singleShot({timeout_ms}, app.quit)
+app.exec()
+'''
+IMPORT_TIME = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Measure the cold start of the Griffin desktop app.")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreter starts to measure.")
+    parser.add_argument("--top", type=int, default=12, help="Packages listed in the import breakdown.")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for the engine to load.")
+    parser.add_argument("--max-window-s", type=float, help="Exit with status 1 if the median time to the window exceeds this.")
+    parser.add_argument("--max-engine-s", type=float, help="Exit with status 1 if the median time to a usable engine exceeds this.")
+    return parser.parse_args()
+
+def child_env():
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    return env
+
+def measure_start(timeout):
+    """Starts the app once and returns the seconds from process start to each milestone it reached."""
+    started = time.perf_counter()
+    script = STARTUP_SCRIPT.format(timeout_ms=int(timeout * 1000))
+    process = subprocess.Popen([sys.executable, '-c', script], cwd=ROOT, env=child_env(),
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    milestones = {}
+    for line in process.stdout:
+        if line.strip() in ('window', 'engine'):
+            milestones[f"{line.strip()}_s"] = time.perf_counter() - started
+    process.wait()
+    return milestones
+
+def import_breakdown(module):
+    """Self import time per top-level package when `module` is imported in a fresh interpreter."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=ROOT, env=child_env(),
+                            capture_output=True, text=True, check=True)
+    rows = [(name.split('.')[0], int(self_us)) for self_us, _, _, name in IMPORT_TIME.findall(result.stderr)]
+    return pd.DataFrame(rows, columns=['package', 'self_us']).groupby('package')['self_us'].sum().div(1e6).rename('seconds')
+
+def main():
+    args = parse_args()
+    starts = pd.DataFrame([measure_start(args.timeout) for _ in range(args.repeat)])
+    print(f"Startup over {args.repeat} cold starts (seconds from process start):")
+    print(starts.describe().loc[['min', '50%', 'max']].round(3).to_string())
+
+    for stage, module in [('before the window', 'ui.main_window'), ('in the background', 'ui.startup, core.analysis_engine')]:
+        breakdown = import_breakdown(module)
+        if stage == 'in the background':
+            breakdown = breakdown.sub(import_breakdown('ui.main_window'), fill_value=0).clip(lower=0)
+        print(f"\nImports {stage}: {breakdown.sum():.3f}s")
+        print(breakdown.sort_values(ascending=False).head(args.top).round(3).to_string())
+
+    failed = []
+    for column, limit in [('window_s', args.max_window_s), ('engine_s', args.max_engine_s)]:
+        if limit is None: continue
+        median = starts[column].median() if column in starts else float('inf')
+        if median > limit: failed.append(f"{column} median {median:.3f}s > {limit:.3f}s")
+    for message in failed:
+        print(f"FAILED: {message}")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
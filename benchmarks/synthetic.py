@@ -0,0 +1,136 @@
+# benchmarks/synthetic.py
+# Seeded multi-broker OHLC generator and a local stand-in for the InfluxDB query API.
+
+import re
+import numpy as np
+import pandas as pd
+
+from core.pipeline import LOOKBACK_DAYS
+from core.rollups import resolution_delta
+
+SYMBOL_VARIANTS = ('', '.c', 'm', '.pro')
+
+def generate_candles(brokers=10, candles=1000, seed=42, symbol='EURUSD', period='H1', symbol_variants=SYMBOL_VARIANTS,
+                     volatility=2e-4, gap_scale=(1e-5, 5e-4), spike_probability=(0.0, 0.05), spike_scale=(2.0, 20.0), end=None):
+    """
+    Returns `candles` bars for each of `brokers` brokers in the long format the pipeline queries:
+    _time, broker, symbol, period and OHLC. All brokers quote one shared mid-price path; each broker
+    draws its own gap size (log-uniform in `gap_scale`), spike frequency (uniform in
+    `spike_probability`) and spike size (uniform in `spike_scale`, in multiples of the candle range),
+    and quotes the symbol under one of `symbol_variants`. The bars are spread evenly over the
+    lookback window, so every candle falls inside the pipeline's query range.
+    """
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp.now(tz='UTC').floor('h') if end is None else end
+    step = (pd.Timedelta(days=LOOKBACK_DAYS) / (candles + 1)).floor('ms')
+    times = pd.date_range(end=end, periods=candles, freq=step)
+    mid = 1.1 + rng.normal(0, volatility, candles).cumsum()
+
+    frames = []
+    for i in range(brokers):
+        gap = np.exp(rng.uniform(*np.log(gap_scale)))
+        close = mid + rng.normal(0, volatility / 4, candles)
+        open_ = np.roll(close, 1) + rng.normal(0, gap, candles)
+        open_[0] = close[0]
+        wick = np.abs(rng.normal(0, volatility / 2, (2, candles)))
+        spikes = rng.random(candles) < rng.uniform(*spike_probability)
+        wick[0, spikes] *= rng.uniform(*spike_scale)
+        frames.append(pd.DataFrame({
+            '_time': times, 'broker': f"Broker{i:04d}", 'symbol': symbol + symbol_variants[i % len(symbol_variants)],
+            'period': period, 'open': open_, 'high': np.maximum(open_, close) + wick[0],
+            'low': np.minimum(open_, close) - wick[1], 'close': close
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+class _Record:
+    def __init__(self, values):
+        self.values = values
+
+    def get_value(self):
+        return self.values['_value']
+
+class _Table:
+    def __init__(self, records):
+        self.records = records
+
+class LocalQueryApi:
+    """
+    Serves the pipeline's Flux queries from an in-memory candle frame. It understands the
+    schema.tagValues metadata query, the per-broker count/sum fingerprint query and the candle
+    query's range and broker/symbol/period filters (equality or regex); the candles are served as the
+    already aggregated bars aggregateWindow would return. Server-side feature queries are not emulated.
+    """
+    def __init__(self, candles_df):
+        self.candles = candles_df
+        self.queries = []
+
+    def query(self, query):
+        self.queries.append(query)
+        if 'count()' in query:
+            closes = self._select(query).groupby('broker', observed=True)['close']
+            return [_Table([_Record({'broker': broker, '_value': value}) for broker, value in aggregate.items()])
+                    for aggregate in [closes.count().astype(float), closes.sum()]]
+        tag = re.search(r'tag: "(\w+)"', query).group(1)
+        return [_Table([_Record({'_value': value}) for value in self.candles[tag].unique()])]
+
+    def query_stream(self, query, batch_rows=10_000):
+        self.queries.append(query)
+        df = self._select(query)
+        # Records are built batch by batch, so the stand-in itself does not hold the whole result as objects.
+        for start in range(0, len(df), batch_rows):
+            batch = df.iloc[start:start + batch_rows]
+            times = batch['_time'].array.to_pydatetime()
+            columns = [batch[col].to_numpy() for col in ['broker', 'open', 'high', 'low', 'close']]
+            for time, broker, open_, high, low, close in zip(times, *columns):
+                yield _Record({'_time': time, 'broker': broker, 'open': open_, 'high': high, 'low': low, 'close': close})
+
+    def query_data_frame(self, query):
+        raise RuntimeError("Server-side Flux aggregation is not emulated by the local query API.")
+
+    def _select(self, query):
+        """Applies the range and tag filters of a candle query."""
+        match = re.search(r'range\(start: ([^,)]+)(?:, stop: ([^)]+))?\)', query)
+        start, stop = match.groups()
+        now = pd.Timestamp.now(tz='UTC')
+        start = now - resolution_delta(start[1:]) if start.startswith('-') else pd.Timestamp(start)
+
+        df = self.candles
+        mask = df['_time'] >= start
+        for tag in ['broker', 'symbol', 'period']:
+            mask &= self._tag_mask(df[tag], tag, query)
+        if stop:
+            mask &= df['_time'] < pd.Timestamp(stop)
+        return df[mask]
+
+    @staticmethod
+    def _tag_mask(column, tag, query):
+        """Evaluates the `==`, `=~` or `!~` predicate on one tag; a tag without a predicate matches everything."""
+        equals = re.findall(rf'r\["{tag}"\] == "([^"]+)"', query)
+        if equals:
+            return column.isin(equals)
+        match = re.search(rf'r\["{tag}"\] ([=!])~ /((?:\\/|[^/])*)/', query)
+        if match is None:
+            return pd.Series(True, index=column.index)
+        matched = column.str.fullmatch(match.group(2).replace('\\/', '/'))
+        return matched if match.group(1) == '=' else ~matched
+
+class LocalInfluxClient:
+    def __init__(self, query_api):
+        self._query_api = query_api
+
+    def query_api(self):
+        return self._query_api
+
+    def close(self):
+        pass
+
+class LocalConnectionPool:
+    """Drop-in for InfluxConnectionPool that hands out the local client for any settings."""
+    def __init__(self, candles_df):
+        self.client = LocalInfluxClient(LocalQueryApi(candles_df))
+
+    def get(self, settings):
+        return self.client
+
+    def close(self):
+        pass
@@ -1,202 +1,157 @@
 # core/analysis_engine.py
-# Added smart symbol normalization logic.
+# Qt front for the analysis pipeline: runs it from worker threads and reports through signals.
 
+import json
+import hashlib
 import logging
+import threading
+from contextlib import contextmanager
 import pandas as pd
-import numpy as np
-import re
-from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
-from sklearn.decomposition import PCA
-from influxdb_client import InfluxDBClient
 from PyQt6.QtCore import QObject, pyqtSlot, pyqtSignal
 
-class AnalysisEngine(QObject):
+from core.pipeline import AnalysisPipeline
+from core.compute_pool import ComputePool
+from core.cancellation import CancelToken, AnalysisCancelled
+
+class AnalysisEngine(QObject, AnalysisPipeline):
     """
-    Handles all data processing, machine learning, and database interactions.
+    Exposes AnalysisPipeline to the GUI. Progress, results and errors are emitted as signals,
+    while the CPU-heavy stages run in a separate process.
     """
     finished = pyqtSignal(pd.DataFrame, pd.DataFrame)
     progress = pyqtSignal(int, str)
     error = pyqtSignal(str)
     metadata_found = pyqtSignal(dict)
+    data_loaded = pyqtSignal(object) # CandleStore; frames are built by the receiver when needed
+    live_updated = pyqtSignal(pd.DataFrame, pd.DataFrame, bool)
+    live_idle = pyqtSignal()
+    profile_ready = pyqtSignal(pd.DataFrame)
+    cancelled = pyqtSignal()
 
     def __init__(self):
-        super().__init__()
-        self.settings = {}
-
-    def _normalize_symbols(self, symbol_list):
+        QObject.__init__(self)
+        AnalysisPipeline.__init__(self)
+        self.compute_pool = ComputePool()
+        # Runs share self.settings, so only one executes at a time; newer requests cancel older ones.
+        self._run_lock = threading.Lock()
+        self._request_lock = threading.Lock()
+        self._pending = None # (settings key, CancelToken) of the newest requested run
+
+    def request_run(self, settings=None):
         """
-        Groups different broker-specific symbol variations (e.g., 'EURUSD.c', 'EURUSDm')
-        under a common base name (e.g., 'EURUSD').
+        Called from the GUI thread before queueing a run. Cancels any older run and returns the
+        new run's token, or None if a run with identical settings is already pending.
         """
-        symbol_map = {}
-        # Regex to find the base symbol (usually 6 uppercase letters)
-        base_symbol_regex = re.compile(r'([A-Z]{6})')
-        
-        for symbol in symbol_list:
-            match = base_symbol_regex.match(symbol.upper())
-            if match:
-                base = match.group(1)
-                if base not in symbol_map:
-                    symbol_map[base] = []
-                symbol_map[base].append(symbol)
-            else:
-                # Fallback for non-standard names, treat them as their own group
-                if symbol not in symbol_map:
-                    symbol_map[symbol] = [symbol]
-                    
-        return symbol_map
+        key = hashlib.sha1(json.dumps(settings, sort_keys=True, default=str).encode()).hexdigest() if settings is not None else None
+        with self._request_lock:
+            if self._pending is not None:
+                pending_key, pending_token = self._pending
+                if key is not None and key == pending_key and not pending_token.cancelled:
+                    return None
+                pending_token.cancel()
+            token = CancelToken()
+            self._pending = (key, token)
+            return token
+
+    def cancel_run(self):
+        with self._request_lock:
+            if self._pending is not None:
+                self._pending[1].cancel()
+                self._pending = None
+
+    @contextmanager
+    def _claim(self, token):
+        """Waits for the previous run to unwind, then makes `token` the current one."""
+        with self._run_lock:
+            token.raise_if_cancelled()
+            self.cancel_token = token
+            try:
+                yield
+            finally:
+                self.cancel_token = None
+                with self._request_lock:
+                    if self._pending is not None and self._pending[1] is token:
+                        self._pending = None
+
+    def _is_current(self):
+        return self.cancel_token is None or not self.cancel_token.cancelled
+
+    def _report_progress(self, value, message):
+        if self._is_current():
+            self.progress.emit(value, message)
+
+    def _publish_data(self, candles):
+        if self._is_current():
+            self.data_loaded.emit(candles)
+
+    def _publish_profile(self, profile_df):
+        if self._is_current():
+            self.profile_ready.emit(profile_df)
 
     @pyqtSlot(dict)
     def fetch_metadata(self, settings):
         """Fetches and normalizes available brokers, symbols, and timeframes."""
         try:
-            self.progress.emit(20, "Connecting to DB to fetch metadata...")
-            metadata = {'brokers': [], 'symbol_map': {}, 'timeframes': []}
-            
-            with InfluxDBClient(url=settings['url'], token=settings['token'], org=settings['org']) as client:
-                query_api = client.query_api()
-                def get_tag_values(tag_name):
-                    query = f'import "influxdata/influxdb/schema" schema.tagValues(bucket: "{settings["bucket"]}", tag: "{tag_name}")'
-                    tables = query_api.query(query)
-                    return [record.get_value() for table in tables for record in table.records]
-
-                self.progress.emit(40, "Fetching brokers...")
-                metadata['brokers'] = get_tag_values("broker")
-                
-                self.progress.emit(60, "Fetching and normalizing symbols...")
-                raw_symbols = get_tag_values("symbol")
-                metadata['symbol_map'] = self._normalize_symbols(raw_symbols)
-
-                self.progress.emit(80, "Fetching timeframes...")
-                metadata['timeframes'] = get_tag_values("period")
-
-            if not metadata['brokers']: raise ValueError("No brokers found.")
-            if not metadata['symbol_map']: raise ValueError("No symbols found.")
-                
-            self.progress.emit(100, "Metadata fetched successfully.")
+            metadata = self.load_metadata(settings)
             self.metadata_found.emit(metadata)
-
         except Exception as e:
             logging.error(f"Metadata fetch failed: {e}", exc_info=True)
             self.error.emit(f"Metadata fetch failed: {e}")
 
-    @pyqtSlot(dict)
-    def run_analysis(self, settings):
-        """Main method to run the full analysis pipeline."""
+    @pyqtSlot(dict, CancelToken)
+    def run_analysis(self, settings, token):
+        """Main method to run the full analysis pipeline; `token` comes from request_run."""
         try:
-            self.settings = settings
-            self.progress.emit(5, "Connecting to InfluxDB...")
-            data_df = self._get_data()
-
-            self.progress.emit(25, "Extracting features...")
-            features_df = self._extract_ohlc_features(data_df)
-
-            if len(features_df) < self.settings['min_brokers']:
-                raise ValueError(f"Clustering requires at least {self.settings['min_brokers']} brokers.")
-
-            self.progress.emit(50, "Performing clustering...")
-            result_df = self._perform_clustering(features_df)
-
-            self.progress.emit(75, "Preparing visualization data...")
-            profile_map = self._interpret_clusters(result_df)
-            final_report = result_df.copy()
-            final_report['Profile'] = final_report['Cluster'].map(profile_map)
-            final_report.sort_values('Cluster', inplace=True)
-            
-            pca_df_for_plot = self._prepare_visualization_data(result_df, profile_map)
-
-            self.progress.emit(100, "Analysis complete.")
-            self.finished.emit(final_report, pca_df_for_plot)
+            with self._claim(token):
+                final_report, pca_df_for_plot = self.analyze(settings)
+                token.raise_if_cancelled()
+                self.finished.emit(final_report, pca_df_for_plot)
+        except AnalysisCancelled:
+            logging.info("Analysis superseded or cancelled.")
+            self.cancelled.emit()
         except Exception as e:
+            if token.cancelled:
+                # A superseded run may fail on its way out; that is not worth reporting.
+                self.cancelled.emit()
+                return
             logging.error(f"Analysis failed: {e}", exc_info=True)
             self.error.emit(str(e))
 
-    def _get_data(self):
-        """Fetches and preprocesses data from InfluxDB using normalized symbols."""
-        with InfluxDBClient(url=self.settings['url'], token=self.settings['token'], org=self.settings['org']) as client:
-            brokers_filter = ' or '.join([f'r["broker"] == "{b}"' for b in self.settings['brokers']])
-            
-            # Create a filter for all symbol variations
-            symbol_variations = self.settings['symbol_map'][self.settings['base_symbol']]
-            symbol_filter = ' or '.join([f'r["symbol"] == "{s}"' for s in symbol_variations])
-
-            flux_query = fr'''
-            from(bucket: "{self.settings['bucket']}")
-              |> range(start: -30d)
-              |> filter(fn: (r) => r["_measurement"] == "price" and ({brokers_filter}))
-              |> filter(fn: (r) => {symbol_filter})
-              |> filter(fn: (r) => r["_field"] == "close" or r["_field"] == "high" or r["_field"] == "low" or r["_field"] == "open")
-              |> filter(fn: (r) => r["period"] == "{self.settings['timeframe']}")
-              |> aggregateWindow(every: 1h, fn: last, createEmpty: false)
-            '''
-            df_raw = client.query_api().query_data_frame(query=flux_query)
-            if df_raw.empty: raise ValueError("Query returned no data for the selected symbols and brokers.")
-
-            df_pivot = df_raw.pivot(index=['_time', 'broker'], columns='_field', values='_value').reset_index()
-            required_cols = ['open', 'high', 'low', 'close']
-            df_pivot.dropna(subset=required_cols, inplace=True)
-            for col in required_cols: df_pivot[col] = pd.to_numeric(df_pivot[col], errors='coerce')
-            df_pivot.dropna(subset=required_cols, inplace=True)
-            if df_pivot.empty: raise ValueError("No valid OHLC data remained after cleaning.")
-            return df_pivot
-
-    def _extract_ohlc_features(self, df):
-        features_list = []
-        for broker in df['broker'].unique():
-            broker_df = df[df['broker'] == broker].copy().sort_values('_time')
-            if len(broker_df) < self.settings['min_points']: continue
-            gap = np.abs(broker_df['open'] - broker_df['close'].shift(1))
-            high_low = broker_df['high'] - broker_df['low']
-            body_size = np.abs(broker_df['open'] - broker_df['close']) + 1e-9
-            spike_ratio = high_low / body_size
-            features_list.append({
-                'broker': broker, 'Gap_Median': gap.median(), 'Spike_Median': spike_ratio.median(),
-                'Spike_Max': spike_ratio.max(), 'Gap_Max': gap.max()
-            })
-        if not features_list: raise ValueError(f"No broker had enough data.")
-        return pd.DataFrame(features_list).set_index('broker')
-
-    def _perform_clustering(self, features_df):
-        scaler = StandardScaler()
-        features_scaled = scaler.fit_transform(features_df)
-        
-        inertias = []
-        max_clusters = min(len(features_scaled), 8)
-        optimal_k = 1
-        if max_clusters > 1:
-            for k in range(1, max_clusters + 1):
-                kmeans = KMeans(n_clusters=k, random_state=42, n_init='auto').fit(features_scaled)
-                inertias.append(kmeans.inertia_)
-            try:
-                deltas = np.diff(inertias, 2)
-                optimal_k = np.argmax(deltas) + 2
-            except ValueError:
-                optimal_k = max_clusters // 2
-        
-        kmeans = KMeans(n_clusters=optimal_k, random_state=42, n_init='auto')
-        result_df = features_df.copy()
-        result_df['Cluster'] = kmeans.fit_predict(features_scaled)
-        return result_df
-
-    def _interpret_clusters(self, result_df):
-        cluster_profiles = result_df.groupby('Cluster').mean()
-        cluster_profiles['Gap_Rank'] = cluster_profiles['Gap_Median'].rank()
-        cluster_profiles['Spike_Rank'] = cluster_profiles['Spike_Median'].rank()
-        cluster_profiles['Overall_Rank'] = cluster_profiles['Gap_Rank'] + cluster_profiles['Spike_Rank']
-        quality_map = {1: "Excellent Quality", 2: "Good Quality", 3: "Standard Quality", 4: "High Risk"}
-        cluster_profiles['Profile_Name'] = cluster_profiles['Overall_Rank'].rank(method='dense').map(quality_map).fillna("General")
-        return cluster_profiles['Profile_Name'].to_dict()
+    @pyqtSlot(dict, CancelToken)
+    def start_live_monitoring(self, settings, token):
+        """Loads the live window and emits the first clustering as a full redraw."""
+        try:
+            with self._claim(token):
+                final_report, pca_df = self.start_live(settings)
+                token.raise_if_cancelled()
+                self.live_updated.emit(final_report, pca_df, True)
+        except AnalysisCancelled:
+            logging.info("Live monitoring start cancelled.")
+            self.cancelled.emit()
+        except Exception as e:
+            if token.cancelled:
+                self.cancelled.emit()
+                return
+            logging.error(f"Live monitoring failed to start: {e}", exc_info=True)
+            self.error.emit(str(e))
 
-    def _prepare_visualization_data(self, result_df, profile_map):
-        """Prepares the DataFrame for plotting in the GUI."""
-        pca = PCA(n_components=2)
-        features_scaled = StandardScaler().fit_transform(result_df.drop(columns=['Cluster']))
-        components = pca.fit_transform(features_scaled)
-        
-        pca_df = pd.DataFrame(data=components, columns=['PC1', 'PC2'], index=result_df.index)
-        pca_df['Cluster'] = result_df['Cluster']
-        pca_df['Profile'] = pca_df['Cluster'].map(profile_map)
-        
-        pca_df.attrs['explained_variance'] = pca.explained_variance_ratio_
-        return pca_df
+    @pyqtSlot(CancelToken)
+    def refresh_live_monitoring(self, token):
+        """Folds in the newly completed bars; emits live_idle when there was nothing new."""
+        try:
+            with self._claim(token):
+                update = self.refresh_live()
+                token.raise_if_cancelled()
+                if update is None:
+                    self.live_idle.emit()
+                else:
+                    self.live_updated.emit(*update)
+        except AnalysisCancelled:
+            logging.info("Live refresh cancelled.")
+            self.cancelled.emit()
+        except Exception as e:
+            if token.cancelled:
+                self.cancelled.emit()
+                return
+            logging.error(f"Live refresh failed: {e}", exc_info=True)
+            self.error.emit(f"Live refresh failed: {e}")
@@ -0,0 +1,68 @@
+# core/batch.py
+# Runs the analysis pipeline for many symbol/timeframe combinations on a process pool.
+
+import os
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+
+from core.pipeline import AnalysisPipeline
+
+_query_gate = None
+
+def _init_worker(query_gate):
+    global _query_gate
+    _query_gate = query_gate
+
+def _run_job(settings):
+    """Runs one symbol/timeframe combination inside a pool process."""
+    pipeline = AnalysisPipeline()
+    if _query_gate is not None:
+        pipeline.query_gate = _query_gate
+    final_report, _ = pipeline.analyze(settings)
+    report = final_report.reset_index()
+    report.insert(0, 'Timeframe', settings['timeframe'])
+    report.insert(0, 'Symbol', settings['base_symbol'])
+    return report
+
+def build_jobs(base_settings, metadata, symbols=None, timeframes=None):
+    """Expands the base settings into one settings dict per (symbol, timeframe) combination."""
+    symbols = symbols or sorted(metadata['symbol_map'])
+    timeframes = timeframes or sorted(metadata['timeframes'])
+    return [
+        {**base_settings, 'base_symbol': symbol, 'timeframe': timeframe, 'symbol_map': metadata['symbol_map']}
+        for symbol in symbols for timeframe in timeframes
+    ]
+
+def run_batch(jobs, max_workers=None, max_queries=4):
+    """
+    Runs all jobs concurrently and returns (consolidated_report, failures), where failures
+    maps (symbol, timeframe) to the error message. At most `max_queries` pool processes
+    talk to InfluxDB at the same time.
+    """
+    max_workers = max_workers or os.cpu_count()
+    query_gate = multiprocessing.Semaphore(max_queries)
+    reports, failures = [], {}
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(query_gate,)) as executor:
+        futures = {executor.submit(_run_job, job): (job['base_symbol'], job['timeframe']) for job in jobs}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                reports.append(future.result())
+                logging.info(f"Finished {key[0]} {key[1]}")
+            except Exception as e:
+                logging.warning(f"Skipped {key[0]} {key[1]}: {e}")
+                failures[key] = str(e)
+
+    if not reports:
+        return pd.DataFrame(), failures
+    consolidated = pd.concat(reports, ignore_index=True).sort_values(['Symbol', 'Timeframe', 'Cluster'], kind='stable')
+    return consolidated.reset_index(drop=True), failures
+
+def write_report(report, path):
+    """Writes the consolidated report as Parquet or CSV, depending on the file extension."""
+    if path.lower().endswith('.parquet'):
+        report.to_parquet(path, index=False)
+    else:
+        report.to_csv(path, index=False)
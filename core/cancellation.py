@@ -0,0 +1,26 @@
+# core/cancellation.py
+# Cooperative cancellation for analysis runs.
+
+import threading
+
+class AnalysisCancelled(Exception):
+    """Raised at a checkpoint once the run's token has been cancelled."""
+
+class CancelToken:
+    """
+    Shared flag between the code that requests a run and the run itself. The pipeline checks it
+    between stages and between streamed query chunks and unwinds with AnalysisCancelled.
+    """
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise AnalysisCancelled("The analysis was cancelled.")
@@ -0,0 +1,105 @@
+# core/candle_store.py
+# Compact, broker-sorted candle arrays shared by the feature and plotting stages.
+
+import numpy as np
+import pandas as pd
+
+from core.ingest import OHLC_COLUMNS
+
+class CandleStore:
+    """
+    Candles as contiguous NumPy arrays sorted by broker, then time: int64 epoch-nanosecond times,
+    small integer broker codes and OHLC prices in `price_dtype`. Broker i owns the rows
+    offsets[i]:offsets[i + 1], so per-broker work runs on slices (views) instead of copies.
+    """
+    def __init__(self, brokers, times, codes, prices, offsets):
+        self.brokers = list(brokers)
+        self.times = times
+        self.codes = codes
+        self.prices = prices # Column name -> array
+        self.offsets = offsets
+
+    @classmethod
+    def from_frames(cls, frames, brokers, price_dtype='float64', since=None):
+        """
+        Builds the store from candle frames (_time, broker, OHLC). Rows of unknown brokers or older
+        than `since` are dropped and, for a repeated (broker, time), the row from the later frame wins.
+        """
+        frames = [f for f in frames if not f.empty]
+        code_dtype = np.int16 if len(brokers) < np.iinfo(np.int16).max else np.int32
+        codes = np.concatenate([pd.Categorical(f['broker'], categories=brokers).codes.astype(code_dtype) for f in frames] or [np.zeros(0, code_dtype)])
+        times = np.concatenate([f['_time'].to_numpy(dtype='datetime64[ns]').view(np.int64) for f in frames] or [np.zeros(0, np.int64)])
+
+        # Flux returns each broker's candles in time order, so the sort (and its copies) is usually skipped.
+        ordered = np.all((codes[1:] > codes[:-1]) | ((codes[1:] == codes[:-1]) & (times[1:] > times[:-1])))
+        keep = codes >= 0
+        if not ordered:
+            # lexsort is stable, so among duplicates the last row comes from the latest frame.
+            order = np.lexsort((times, codes))
+            codes, times = codes[order], times[order]
+            keep = codes >= 0
+            keep[:-1] &= (codes[1:] != codes[:-1]) | (times[1:] != times[:-1])
+        if since is not None:
+            keep &= times >= pd.Timestamp(since).value
+        rows = order[keep] if not ordered else (None if keep.all() else np.flatnonzero(keep))
+
+        prices = {}
+        for col in OHLC_COLUMNS:
+            column = np.concatenate([f[col].to_numpy(dtype=price_dtype) for f in frames] or [np.zeros(0, price_dtype)])
+            prices[col] = column if rows is None else column[rows]
+        if rows is not None:
+            codes, times = codes[keep], times[keep]
+        offsets = np.searchsorted(codes, np.arange(len(brokers) + 1))
+        return cls(brokers, times, codes, prices, offsets)
+
+    def __len__(self):
+        return len(self.times)
+
+    @property
+    def nbytes(self):
+        return self.times.nbytes + self.codes.nbytes + self.offsets.nbytes + sum(a.nbytes for a in self.prices.values())
+
+    def counts(self):
+        """Candles per broker, in broker order."""
+        return pd.Series(np.diff(self.offsets), index=self.brokers)
+
+    def series(self, i):
+        """Returns (times, open, high, low, close) views for the broker at position `i`."""
+        rows = slice(self.offsets[i], self.offsets[i + 1])
+        return (self.times[rows], *(self.prices[col][rows] for col in OHLC_COLUMNS))
+
+    def frame(self, brokers=None):
+        """
+        Returns the candles (optionally only `brokers`) as a DataFrame with UTC times and a
+        categorical broker column, e.g. for display or the disk cache.
+        """
+        if brokers is None:
+            rows = slice(None)
+        else:
+            positions = [self.brokers.index(b) for b in brokers]
+            rows = np.concatenate([np.arange(self.offsets[i], self.offsets[i + 1]) for i in positions] or [np.zeros(0, np.intp)])
+        df = pd.DataFrame({
+            '_time': pd.Series(self.times[rows].view('datetime64[ns]'), copy=False).dt.tz_localize('UTC'),
+            'broker': pd.Categorical.from_codes(self.codes[rows], categories=self.brokers),
+        })
+        for col in OHLC_COLUMNS:
+            df[col] = self.prices[col][rows]
+        return df
+
+    def features(self, min_points):
+        """
+        Computes the per-broker gap/spike statistics on views of the arrays; only the per-broker
+        gap and spike vectors are allocated, in float64.
+        """
+        features_list = []
+        for i, broker in enumerate(self.brokers):
+            if self.offsets[i + 1] - self.offsets[i] < min_points: continue
+            _, opens, highs, lows, closes = self.series(i)
+            gap = np.abs(np.subtract(opens[1:], closes[:-1], dtype=np.float64))
+            spike = np.subtract(highs, lows, dtype=np.float64) / (np.abs(np.subtract(opens, closes, dtype=np.float64)) + 1e-9)
+            features_list.append({
+                'broker': broker, 'Gap_Median': np.median(gap) if gap.size else np.nan, 'Spike_Median': np.median(spike),
+                'Spike_Max': spike.max(), 'Gap_Max': gap.max() if gap.size else np.nan
+            })
+        if not features_list: raise ValueError(f"No broker had enough data.")
+        return pd.DataFrame(features_list).set_index('broker')
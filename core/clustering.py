@@ -0,0 +1,74 @@
+# core/clustering.py
+# K-Means with elbow selection, shared scaling for PCA and memoized results.
+
+import hashlib
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from threadpoolctl import threadpool_limits
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.decomposition import PCA
+
+class ClusteringEngine:
+    """
+    Picks the cluster count with the elbow method and projects the same scaled matrix to 2D.
+    Results are cached by a hash of the feature matrix, so identical inputs skip the ML entirely.
+    """
+    def __init__(self, max_clusters=8, random_state=42, minibatch_threshold=5000, cache_size=32):
+        self.max_clusters = max_clusters
+        self.random_state = random_state
+        # Above this many brokers MiniBatchKMeans is used instead of full K-Means.
+        self.minibatch_threshold = minibatch_threshold
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def _cache_key(self, features_df):
+        digest = hashlib.sha1(pd.util.hash_pandas_object(features_df, index=True).to_numpy().tobytes())
+        digest.update(repr((list(features_df.columns), self.max_clusters, self.random_state, self.minibatch_threshold)).encode())
+        return digest.hexdigest()
+
+    def _fit(self, features_scaled, k):
+        if len(features_scaled) >= self.minibatch_threshold:
+            return MiniBatchKMeans(n_clusters=k, random_state=self.random_state, n_init='auto', batch_size=1024).fit(features_scaled)
+        return KMeans(n_clusters=k, random_state=self.random_state, n_init='auto').fit(features_scaled)
+
+    def run(self, features_df):
+        """
+        Returns (labels, components, explained_variance, projector) for the given feature frame,
+        where projector is the fitted scaler + PCA that maps new feature rows onto the same plane.
+        """
+        key = self._cache_key(features_df)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        scaler = StandardScaler().fit(features_df)
+        features_scaled = scaler.transform(features_df)
+        max_clusters = min(len(features_scaled), self.max_clusters)
+        labels = np.zeros(len(features_scaled), dtype=np.int32)
+        if max_clusters > 1:
+            # One thread per fit: running the k values side by side beats nested OpenMP pools.
+            with threadpool_limits(limits=1):
+                models = Parallel(n_jobs=-1, prefer='threads')(
+                    delayed(self._fit)(features_scaled, k) for k in range(1, max_clusters + 1)
+                )
+            inertias = [model.inertia_ for model in models]
+            try:
+                deltas = np.diff(inertias, 2)
+                optimal_k = np.argmax(deltas) + 2
+            except ValueError:
+                optimal_k = max_clusters // 2
+            if optimal_k > 1:
+                labels = models[optimal_k - 1].labels_.astype(np.int32)
+
+        pca = PCA(n_components=2)
+        components = pca.fit_transform(features_scaled)
+        result = (labels, components, pca.explained_variance_ratio_, Pipeline([('scale', scaler), ('pca', pca)]))
+
+        self._cache[key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
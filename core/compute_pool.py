@@ -0,0 +1,108 @@
+# core/compute_pool.py
+# Runs the CPU-heavy pipeline stages in a separate process, so they never hold the GUI's GIL.
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+
+from core.ingest import OHLC_COLUMNS
+from core.candle_store import CandleStore
+
+CANCEL_POLL_SECONDS = 0.1
+
+def share_candles(candles):
+    """
+    Copies the arrays of a CandleStore once into a shared memory block and returns (shm, spec).
+    The spec is all a child process needs to map the same memory without any pickling of the data.
+    """
+    arrays = {'times': candles.times, 'codes': candles.codes, 'offsets': candles.offsets, **candles.prices}
+    shm = SharedMemory(create=True, size=max(1, sum(a.nbytes for a in arrays.values())))
+    columns, offset = [], 0
+    for name, array in arrays.items():
+        np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf, offset=offset)[:] = array
+        columns.append((name, array.dtype.str, len(array), offset))
+        offset += array.nbytes
+    spec = {'name': shm.name, 'columns': columns, 'brokers': candles.brokers}
+    return shm, spec
+
+def _store_from_shared(shm, spec):
+    """Builds a CandleStore whose arrays are views into the shared block."""
+    views = {name: np.ndarray((length,), dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+             for name, dtype, length, offset in spec['columns']}
+    return CandleStore(spec['brokers'], views['times'], views['codes'], {col: views[col] for col in OHLC_COLUMNS}, views['offsets'])
+
+_worker_pipeline = None
+
+def _get_pipeline(settings):
+    """Returns this worker process's pipeline, kept alive so its clustering cache survives between runs."""
+    global _worker_pipeline
+    if _worker_pipeline is None:
+        from core.pipeline import AnalysisPipeline
+        _worker_pipeline = AnalysisPipeline()
+    _worker_pipeline.settings = settings
+    return _worker_pipeline
+
+def _extract_features_job(spec, settings):
+    shm = SharedMemory(name=spec['name'])
+    try:
+        return _get_pipeline(settings)._extract_ohlc_features(_store_from_shared(shm, spec))
+    finally:
+        shm.close()
+
+def _clustering_job(features_df, settings):
+    return _get_pipeline(settings)._perform_clustering(features_df)
+
+def _warm_up_job():
+    _get_pipeline({})
+
+class ComputePool:
+    """
+    A single long-lived worker process for feature extraction and clustering. Candles are handed
+    over through shared memory; only the small feature and result frames cross the pipe. Stages
+    that consume the query stream chunk by chunk (streaming/sketch folds, CandleStore building)
+    are not shipped here, since each chunk would have to be pickled over.
+    """
+    def __init__(self, max_workers=1):
+        self.max_workers = max_workers
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            # Forking a process that runs Qt threads is unsafe, so always start a fresh interpreter.
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    def _result(self, future, cancel_token):
+        """
+        Waits for a job while watching the token. A cancelled job is dropped from the queue if it
+        has not started yet; a running one is left to finish and its result is discarded.
+        """
+        while cancel_token is not None:
+            try:
+                return future.result(timeout=CANCEL_POLL_SECONDS)
+            except FutureTimeout:
+                if cancel_token.cancelled:
+                    future.cancel()
+                    cancel_token.raise_if_cancelled()
+        return future.result()
+
+    def extract_features(self, candles, settings, cancel_token=None):
+        shm, spec = share_candles(candles)
+        try:
+            return self._result(self._get_executor().submit(_extract_features_job, spec, settings), cancel_token)
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def warm_up(self):
+        """Starts the worker process and imports the pipeline there, so the first analysis does not wait for it."""
+        return self._get_executor().submit(_warm_up_job)
+
+    def perform_clustering(self, features_df, settings, cancel_token=None):
+        return self._result(self._get_executor().submit(_clustering_job, features_df, settings), cancel_token)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
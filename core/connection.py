@@ -0,0 +1,32 @@
+# core/connection.py
+# Session-wide pool of InfluxDB clients.
+
+import threading
+from influxdb_client import InfluxDBClient
+
+class InfluxConnectionPool:
+    """
+    Keeps one InfluxDBClient per (url, token, org) open for the whole session instead of
+    opening and tearing one down for every query. The client's HTTP pool is sized so
+    concurrent queries from several threads can share it.
+    """
+    def __init__(self, pool_size=8):
+        self.pool_size = pool_size
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def get(self, settings):
+        key = (settings['url'], settings['token'], settings['org'])
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = InfluxDBClient(url=settings['url'], token=settings['token'], org=settings['org'],
+                                        connection_pool_maxsize=self.pool_size)
+                self._clients[key] = client
+            return client
+
+    def close(self):
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
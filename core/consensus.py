@@ -0,0 +1,65 @@
+# core/consensus.py
+# Cross-broker features: each broker's quotes against the market consensus at the same timestamps.
+
+import numpy as np
+import pandas as pd
+
+CONSENSUS_COLUMNS = ['Consensus_Dev_Median', 'Consensus_Dev_Max', 'Consensus_Lag_Corr', 'Missing_Bar_Ratio']
+
+def close_matrix(candles):
+    """
+    Pivots the closes of a CandleStore into a dense float64 (timestamps x brokers) matrix aligned on
+    the union of all bar times; bars a broker did not quote are NaN. Returns (times, matrix).
+    """
+    times, rows = np.unique(candles.times, return_inverse=True)
+    matrix = np.full((len(times), len(candles.brokers)), np.nan)
+    matrix[rows, candles.codes] = candles.prices['close']
+    return times, matrix
+
+def _nan_corr(x, y):
+    """Column-wise Pearson correlation of matrix `x` with vector `y` over the rows where both are present."""
+    present = ~np.isnan(x) & ~np.isnan(y)[:, None]
+    n = present.sum(axis=0)
+    x = np.where(present, x, 0.0)
+    y = np.where(present, y[:, None], 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x, mean_y = x.sum(axis=0) / n, y.sum(axis=0) / n
+        cov = (x * y).sum(axis=0) / n - mean_x * mean_y
+        var_x = (x * x).sum(axis=0) / n - mean_x ** 2
+        var_y = (y * y).sum(axis=0) / n - mean_y ** 2
+        return cov / np.sqrt(var_x * var_y)
+
+def consensus_features(candles):
+    """
+    Per-broker features against the per-timestamp consensus (median close across brokers), computed
+    with whole-matrix operations:
+    - Consensus_Dev_Median / _Max: relative distance of the broker's close from the consensus.
+    - Consensus_Lag_Corr: correlation of the broker's returns with the consensus return one bar
+      earlier; high values mean the broker follows the market late.
+    - Missing_Bar_Ratio: share of the market's bars the broker did not quote between its first and
+      last bar.
+    Brokers without candles are left out; undefined values (e.g. constant quotes) are reported as 0.
+    """
+    _, matrix = close_matrix(candles)
+    has_candles = np.diff(candles.offsets) > 0
+    matrix = matrix[:, has_candles]
+    quoted = ~np.isnan(matrix)
+    consensus = np.nanmedian(matrix, axis=1)
+    deviation = np.abs(matrix - consensus[:, None]) / np.abs(consensus)[:, None]
+
+    # Broker return at t against the consensus return at t - 1.
+    returns = np.diff(matrix, axis=0)[1:]
+    lagged_consensus = np.diff(consensus)[:-1]
+    lag_corr = _nan_corr(returns, lagged_consensus)
+
+    first = np.argmax(quoted, axis=0)
+    last = len(matrix) - 1 - np.argmax(quoted[::-1], axis=0)
+    missing = 1 - quoted.sum(axis=0) / (last - first + 1)
+
+    features = pd.DataFrame({
+        'Consensus_Dev_Median': np.nanmedian(deviation, axis=0),
+        'Consensus_Dev_Max': np.nanmax(deviation, axis=0),
+        'Consensus_Lag_Corr': lag_corr,
+        'Missing_Bar_Ratio': missing,
+    }, index=pd.Index(np.asarray(candles.brokers, dtype=object)[has_candles], name='broker'))
+    return features.fillna(0.0)
@@ -0,0 +1,44 @@
+# core/data_cache.py
+# On-disk Parquet cache of cleaned OHLC candles, used for incremental fetching.
+
+import os
+import hashlib
+import logging
+import pandas as pd
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".griffin", "cache")
+
+class CandleCache:
+    """
+    Stores cleaned candles per (bucket, broker, symbol variations, period, resolution, price dtype) as
+    Parquet files, so repeated analyses only have to fetch the bars newer than what is already on disk.
+    The dtype is part of the key, so float32-rounded prices never end up in a float64 run.
+    """
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, bucket, broker, symbols, period, resolution, price_dtype):
+        key = "|".join([bucket, broker, ",".join(sorted(symbols)), period, resolution, price_dtype])
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.parquet")
+
+    def load(self, bucket, broker, symbols, period, resolution='1h', price_dtype='float64'):
+        """Returns the cached candles for one broker, or None if nothing usable is stored."""
+        path = self._path(bucket, broker, symbols, period, resolution, price_dtype)
+        if not os.path.exists(path):
+            return None
+        try:
+            df = pd.read_parquet(path)
+        except Exception as e:
+            logging.warning(f"Discarding unreadable cache file {path}: {e}")
+            os.remove(path)
+            return None
+        return df if not df.empty else None
+
+    def store(self, bucket, broker, symbols, period, df, resolution='1h', price_dtype='float64'):
+        """Writes one broker's candles atomically, replacing any previous entry."""
+        path = self._path(bucket, broker, symbols, period, resolution, price_dtype)
+        tmp_path = f"{path}.tmp"
+        df.reset_index(drop=True).to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
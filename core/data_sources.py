@@ -0,0 +1,403 @@
+# core/data_sources.py
+# Pluggable candle backends: the interface the pipeline reads through, InfluxDB and file-backed implementations.
+
+import os
+import re
+import abc
+import hashlib
+import logging
+import operator
+from contextlib import nullcontext
+from functools import reduce
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from pyarrow import fs
+
+from core.ingest import OHLC_COLUMNS, CHUNK_ROWS, iter_candle_chunks
+from core.ticks import TICK_MEASUREMENT, iter_tick_chunks
+from core.rollups import resolution_delta, period_delta, ohlc_window_query, rollup_bucket
+
+FILE_FORMATS = {'.parquet': 'parquet', '.pq': 'parquet', '.arrow': 'ipc', '.feather': 'ipc', '.ipc': 'ipc', '.csv': 'csv'}
+FEATURE_NAMES = ['Gap_Median', 'Spike_Median', 'Spike_Max', 'Gap_Max']
+
+def _flux_regex(values):
+    """Anchored Flux regex literal that matches exactly the given strings."""
+    escaped = sorted(re.sub(r'([\\.+*?()|\[\]{}^$/])', r'\\\1', v) for v in values)
+    return f"/^(?:{'|'.join(escaped)})$/"
+
+def _flux_time(timestamp):
+    return timestamp.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def _tag_filter(tag, values, universe=None):
+    """
+    Flux predicate for `tag` being one of `values`, as a single anchored regex that InfluxDB can push
+    down to storage. Given the tag's full `universe`, the smaller complement is negated instead, and
+    None is returned when nothing would be excluded.
+    """
+    values = set(values)
+    if universe is not None:
+        excluded = set(universe) - values
+        if not excluded: return None
+        if len(excluded) < len(values): return f'r["{tag}"] !~ {_flux_regex(excluded)}'
+    if len(values) == 1: return f'r["{tag}"] == "{next(iter(values))}"'
+    return f'r["{tag}"] =~ {_flux_regex(values)}'
+
+class DataSource(abc.ABC):
+    """
+    A source of candles. `tag_values` backs metadata loading and `candle_chunks` must yield typed
+    chunks (UTC `_time`, categorical broker, OHLC in `price_dtype`), each broker's candles in time
+    order, for [start, stop); without a stop the read ends at the source's window end.
+    Ticks and server-side aggregation are optional and raise NotImplementedError where missing.
+    """
+    # Whether reads go over the network, so keeping candles in the on-disk cache pays off.
+    remote = False
+
+    @abc.abstractmethod
+    def tag_values(self, tag):
+        """All values of a tag (broker, symbol or period) in the source."""
+
+    @abc.abstractmethod
+    def newest_time(self, brokers=None, symbols=None, period=None):
+        """End of the selected data, where the lookback window of a run is anchored."""
+
+    @abc.abstractmethod
+    def fingerprint(self, brokers=None, symbols=None, period=None, start=None):
+        """Changes whenever the selected data from `start` to the window end may have changed."""
+
+    @abc.abstractmethod
+    def candle_chunks(self, brokers, symbols, period, start, stop=None, resolution=None, categories=None, price_dtype='float64'):
+        """Yields the selected candles in [start, stop), at `resolution` if it is coarser than the stored bars."""
+
+    def tick_chunks(self, brokers, symbols, start, stop):
+        """Yields the selected bid/ask ticks in [start, stop) as TICK_DTYPE arrays."""
+        raise NotImplementedError(f"{type(self).__name__} has no tick data")
+
+    def server_features(self, brokers, symbols, period, start, resolution):
+        """Returns per-broker Points and gap/spike features aggregated where the data lives."""
+        raise NotImplementedError(f"{type(self).__name__} cannot aggregate features on the server")
+
+class InfluxDataSource(DataSource):
+    """
+    Reads the bucket named in the settings through the session's pooled client. Reads end at the
+    window stop, the start of the still-forming bar at the run's resolution, fixed when the source
+    is opened so every query (and the fingerprint) covers the same completed bars. A `query_gate`
+    slot is held for the duration of every single query, and streamed records pass through
+    `cancellable` so a run can be stopped mid-stream.
+    """
+    remote = True
+
+    def __init__(self, settings, connections, resolution=None, query_gate=None, cancellable=None):
+        self.settings = settings
+        self.connections = connections
+        self.resolution = resolution
+        self.query_gate = query_gate if query_gate is not None else nullcontext()
+        self._cancellable = cancellable or iter
+        now = pd.Timestamp.now(tz='UTC')
+        self.window_stop = now.floor(resolution_delta(resolution)) if resolution else now
+
+    def _query_api(self):
+        return self.connections.get(self.settings).query_api()
+
+    def tag_values(self, tag):
+        query = f'import "influxdata/influxdb/schema" schema.tagValues(bucket: "{self.settings["bucket"]}", tag: "{tag}")'
+        with self.query_gate:
+            tables = self._query_api().query(query)
+        return [record.get_value() for table in tables for record in table.records]
+
+    def newest_time(self, brokers=None, symbols=None, period=None):
+        return self.window_stop
+
+    def fingerprint(self, brokers=None, symbols=None, period=None, start=None):
+        """
+        Per-broker count and sum of the selected closes up to the window stop, read from the bucket
+        the candles come from. Late writes, backfills and corrected values all change it, and both
+        aggregates are pushed down to storage, so the query stays cheap next to reading the candles.
+        """
+        filters = ['r["_measurement"] == "price"', 'r["_field"] == "close"']
+        if brokers is not None: filters.append(_tag_filter('broker', brokers, self.settings.get('broker_universe')))
+        if symbols is not None: filters.append(_tag_filter('symbol', symbols))
+        if period is not None: filters.append(_tag_filter('period', [period]))
+        bucket = rollup_bucket(self.settings['bucket'], self.resolution) if self.settings.get('use_rollups') else self.settings['bucket']
+        start = _flux_time(start) if start is not None else '0'
+        query = f'''
+        closes = from(bucket: "{bucket}")
+          |> range(start: {start}, stop: {_flux_time(self.window_stop)})
+          |> filter(fn: (r) => {' and '.join(f for f in filters if f)})
+          |> group(columns: ["broker"])
+
+        union(tables: [closes |> count() |> toFloat(), closes |> sum()])
+        '''
+        with self.query_gate:
+            tables = self._query_api().query(query)
+        aggregates = sorted((record.values['broker'], record.get_value()) for table in tables for record in table.records)
+        return hashlib.sha1(repr(aggregates).encode()).hexdigest()[:16]
+
+    def _candle_query(self, brokers, symbols, period, start, stop, resolution):
+        """
+        Builds the Flux pipeline that returns one pivoted OHLC row per broker and candle at
+        `resolution`. With 'use_rollups' the candles are read as-is from the matching rollup bucket;
+        otherwise the raw fields are downsampled at query time. Tag filters are single regex matches,
+        so the query stays the same shape for any selection size.
+        """
+        filters = [
+            'r["_measurement"] == "price"',
+            _tag_filter('broker', brokers, self.settings.get('broker_universe')),
+            _tag_filter('symbol', symbols),
+            _tag_filter('period', [period])
+        ]
+        predicate = ' and '.join(f for f in filters if f)
+        range_args = f"start: {_flux_time(start)}, stop: {_flux_time(stop or self.window_stop)}"
+
+        if self.settings.get('use_rollups'):
+            source = f'''from(bucket: "{rollup_bucket(self.settings['bucket'], resolution)}")
+          |> range({range_args})
+          |> filter(fn: (r) => {predicate} and {_tag_filter('_field', ['open', 'high', 'low', 'close'])})'''
+        else:
+            source = ohlc_window_query(self.settings['bucket'], range_args, predicate, resolution)
+
+        return f'''
+        {source}
+          |> group(columns: ["broker"])
+          |> pivot(rowKey: ["_time"], columnKey: ["_field"], valueColumn: "_value")
+          |> sort(columns: ["_time"])
+        '''
+
+    def candle_chunks(self, brokers, symbols, period, start, stop=None, resolution=None, categories=None, price_dtype='float64'):
+        """Streams the candles; the query_gate slot is held until the stream is exhausted or closed."""
+        query = self._candle_query(brokers, symbols, period, start, stop, resolution or self.resolution)
+        with self.query_gate:
+            records = self._cancellable(self._query_api().query_stream(query=query))
+            yield from iter_candle_chunks(records, categories or brokers, price_dtype=price_dtype)
+
+    def _tick_query(self, brokers, symbols, start, stop):
+        """Flux query for the brokers' bid/ask ticks in [start, stop), one time-ordered table per broker."""
+        filters = [
+            f'r["_measurement"] == "{self.settings.get("tick_measurement", TICK_MEASUREMENT)}"',
+            _tag_filter('broker', brokers, self.settings.get('broker_universe')),
+            _tag_filter('symbol', symbols),
+            _tag_filter('_field', ['bid', 'ask'])
+        ]
+        return f'''
+        from(bucket: "{self.settings['bucket']}")
+          |> range(start: {_flux_time(start)}, stop: {_flux_time(stop)})
+          |> filter(fn: (r) => {' and '.join(f for f in filters if f)})
+          |> group(columns: ["broker"])
+          |> pivot(rowKey: ["_time"], columnKey: ["_field"], valueColumn: "_value")
+          |> sort(columns: ["_time"])
+        '''
+
+    def tick_chunks(self, brokers, symbols, start, stop):
+        with self.query_gate:
+            records = self._cancellable(self._query_api().query_stream(query=self._tick_query(brokers, symbols, start, stop)))
+            yield from iter_tick_chunks(records, brokers)
+
+    def server_features(self, brokers, symbols, period, start, resolution):
+        """
+        Lets InfluxDB pivot the candles and reduce them to one feature row per broker,
+        so only the aggregates travel over the network.
+        """
+        # open - prev_close is rebuilt as (open - close) + (close - prev_close), because
+        # difference() only sees one column at a time.
+        flux_query = f'''
+        import "math"
+
+        candles = {self._candle_query(brokers, symbols, period, start, None, resolution).strip()}
+          |> filter(fn: (r) => exists r.open and exists r.high and exists r.low and exists r.close)
+
+        gaps = candles
+          |> map(fn: (r) => ({{r with body: r.open - r.close}}))
+          |> difference(columns: ["close"])
+          |> map(fn: (r) => ({{broker: r.broker, _value: math.abs(x: r.body + r.close)}}))
+
+        spikes = candles
+          |> map(fn: (r) => ({{broker: r.broker, _value: (r.high - r.low) / (math.abs(x: r.open - r.close) + 0.000000001)}}))
+
+        points = candles
+          |> count(column: "open")
+          |> map(fn: (r) => ({{broker: r.broker, _field: "Points", _value: float(v: r.open)}}))
+
+        union(tables: [
+            points,
+            gaps |> quantile(q: 0.5, method: "exact_mean") |> map(fn: (r) => ({{broker: r.broker, _field: "Gap_Median", _value: r._value}})),
+            spikes |> quantile(q: 0.5, method: "exact_mean") |> map(fn: (r) => ({{broker: r.broker, _field: "Spike_Median", _value: r._value}})),
+            spikes |> max() |> map(fn: (r) => ({{broker: r.broker, _field: "Spike_Max", _value: r._value}})),
+            gaps |> max() |> map(fn: (r) => ({{broker: r.broker, _field: "Gap_Max", _value: r._value}}))
+          ])
+          |> group()
+          |> pivot(rowKey: ["broker"], columnKey: ["_field"], valueColumn: "_value")
+        '''
+        with self.query_gate:
+            df = self._query_api().query_data_frame(query=flux_query)
+        if isinstance(df, list): df = pd.concat(df, ignore_index=True)
+        if df.empty: return pd.DataFrame(columns=['Points'] + FEATURE_NAMES, index=pd.Index([], name='broker'), dtype=float)
+        # A negated broker filter also matches brokers added since the metadata fetch; only selected ones are kept.
+        df = df[df['broker'].isin(brokers)]
+        return df.set_index('broker')[['Points'] + FEATURE_NAMES].astype(float)
+
+class FileDataSource(DataSource):
+    """
+    Reads candles from a directory (or file) of Parquet, Arrow IPC/Feather or CSV files with the
+    columns _time, broker, symbol, period, open, high, low and close. Files are memory-mapped, and
+    the broker/symbol/period/time filters and the column selection are pushed into the Arrow scan,
+    so hive partitions (e.g. broker=X/symbol=Y/period=H1/) and Parquet row groups that cannot match
+    are never read. All selected brokers come from one scan, ordered by broker and time in Arrow.
+    """
+    def __init__(self, path, file_format=None):
+        self.path = path
+        self.dataset = ds.dataset(path, format=file_format or self._detect_format(path), partitioning='hive',
+                                  filesystem=fs.LocalFileSystem(use_mmap=True))
+        if '_time' not in self.dataset.schema.names:
+            raise ValueError(f"{path} has no _time column.")
+        self._newest_times = {}
+
+    @staticmethod
+    def _detect_format(path):
+        if os.path.isfile(path):
+            names = [path]
+        else:
+            names = [name for _, _, files in os.walk(path) for name in files]
+        for name in names:
+            file_format = FILE_FORMATS.get(os.path.splitext(name)[1].lower())
+            if file_format: return file_format
+        raise ValueError(f"No Parquet, Arrow or CSV files found in {path}.")
+
+    def tag_values(self, tag):
+        return pc.unique(self.dataset.to_table(columns=[tag])[tag]).to_pylist()
+
+    @staticmethod
+    def _selection(brokers=None, symbols=None, period=None):
+        """Filter for the broker/symbol/period selection; None selects everything."""
+        conditions = [ds.field(tag).isin(list(values)) for tag, values in [('broker', brokers), ('symbol', symbols)] if values is not None]
+        if period is not None:
+            conditions.append(ds.field('period') == period)
+        return reduce(operator.and_, conditions) if conditions else None
+
+    def newest_time(self, brokers=None, symbols=None, period=None):
+        """
+        The newest candle time of the selected brokers, symbols and period, so archives are analyzed up to
+        the last bar of that instrument. Parquet row groups whose partition keys or statistics pin every
+        selected column are answered from their _time statistics; the rest are scanned with the filter
+        pushed down. Results are kept per selection for the lifetime of the source.
+        """
+        required = [tag for tag, values in [('broker', brokers), ('symbol', symbols), ('period', period)] if values is not None]
+        key = (tuple(sorted(brokers or ())), tuple(sorted(symbols or ())), period)
+        if key not in self._newest_times:
+            selection = self._selection(brokers, symbols, period)
+            newest = None
+            for fragment in self.dataset.get_fragments(filter=selection):
+                for value in self._fragment_newest(fragment, required, selection):
+                    if newest is None or value > newest: newest = value
+            if newest is None: raise ValueError(f"No candles found in {self.path} for the selected brokers, symbols and timeframe.")
+            self._newest_times[key] = newest
+        return self._newest_times[key]
+
+    def _fragment_newest(self, fragment, required, selection):
+        """Yields the newest matching time of each part of a fragment that can contain matching rows."""
+        if not isinstance(fragment, ds.ParquetFileFragment) or not pa.types.is_timestamp(self.dataset.schema.field('_time').type):
+            yield from self._scan_newest(fragment, selection)
+            return
+        partition_keys = ds.get_partition_keys(fragment.partition_expression)
+        for row_group in fragment.split_by_row_group(filter=selection, schema=self.dataset.schema):
+            statistics = row_group.row_groups[0].statistics
+            # A tag is pinned when it is a partition key or constant in the row group; pruning already checked its value.
+            pinned = all(tag in partition_keys or (tag in statistics and statistics[tag]['min'] == statistics[tag]['max']) for tag in required)
+            if pinned and statistics.get('_time', {}).get('max') is not None:
+                yield _utc(statistics['_time']['max'])
+            else:
+                yield from self._scan_newest(row_group, selection)
+
+    def _scan_newest(self, fragment, selection):
+        newest = pc.max(fragment.to_table(schema=self.dataset.schema, columns=['_time'], filter=selection)['_time']).as_py()
+        if newest is not None:
+            yield _utc(newest)
+
+    def fingerprint(self, brokers=None, symbols=None, period=None, start=None):
+        return _files_fingerprint(self.dataset.files)
+
+    def _time_scalar(self, timestamp):
+        """`timestamp` as a scalar of the dataset's _time type; tz-naive files are taken to be UTC."""
+        time_type = self.dataset.schema.field('_time').type
+        timestamp = pd.Timestamp(timestamp).tz_convert('UTC')
+        if not pa.types.is_timestamp(time_type):
+            return pa.scalar(timestamp.isoformat(), type=time_type)
+        return pa.scalar(timestamp if time_type.tz else timestamp.tz_localize(None), type=time_type)
+
+    def candle_chunks(self, brokers, symbols, period, start, stop=None, resolution=None, categories=None, price_dtype='float64'):
+        columns = ['_time'] + OHLC_COLUMNS
+        base_filter = self._selection(symbols=symbols, period=period) & (ds.field('_time') >= self._time_scalar(start))
+        if stop is not None:
+            base_filter &= ds.field('_time') < self._time_scalar(stop)
+        # Re-aggregating is only needed when the requested resolution is coarser than the stored bars.
+        bar = period_delta(period)
+        every = resolution_delta(resolution) if resolution and (bar is None or resolution_delta(resolution) > bar) else None
+
+        table = self.dataset.to_table(columns=['broker'] + columns, filter=base_filter & ds.field('broker').isin(list(brokers)))
+        table = table.take(pc.sort_indices(table, sort_keys=[('broker', 'ascending'), ('_time', 'ascending')]))
+        counts = pc.value_counts(table['broker'])
+        offsets = np.r_[0, np.cumsum(counts.field('counts').to_numpy())]
+        slices = {broker: (offset, length) for broker, offset, length
+                  in zip(counts.field('values').to_pylist(), offsets[:-1], np.diff(offsets))}
+        table = table.drop_columns(['broker'])
+
+        for broker in brokers:
+            if broker not in slices: continue
+            df = table.slice(*slices[broker]).to_pandas()
+            df['_time'] = pd.to_datetime(df['_time'], utc=True)
+            df = df.drop_duplicates('_time', keep='last')
+            if every is not None:
+                df = self._downsample(df, every)
+            df.insert(1, 'broker', pd.Categorical([broker] * len(df), categories=categories or brokers))
+            for col in OHLC_COLUMNS:
+                df[col] = df[col].astype(price_dtype)
+            df = df.dropna(subset=OHLC_COLUMNS).reset_index(drop=True)
+            for offset in range(0, len(df), CHUNK_ROWS):
+                yield df.iloc[offset:offset + CHUNK_ROWS]
+
+    @staticmethod
+    def _downsample(df, every):
+        """OHLC-aggregates time-ordered bars into `every` windows, labeled with the window end like aggregateWindow."""
+        times = df['_time'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+        windows = times // every.value
+        starts = np.flatnonzero(np.r_[True, windows[1:] != windows[:-1]])
+        ends = np.r_[starts[1:], len(df)] - 1
+        return pd.DataFrame({
+            '_time': pd.to_datetime((windows[starts] + 1) * every.value, utc=True),
+            'open': df['open'].to_numpy()[starts],
+            'high': np.maximum.reduceat(df['high'].to_numpy(), starts),
+            'low': np.minimum.reduceat(df['low'].to_numpy(), starts),
+            'close': df['close'].to_numpy()[ends]
+        })
+
+def _utc(value):
+    timestamp = pd.Timestamp(value)
+    return timestamp.tz_localize('UTC') if timestamp.tzinfo is None else timestamp.tz_convert('UTC')
+
+def _files_fingerprint(files):
+    stats = [(f, os.stat(f).st_size, os.stat(f).st_mtime_ns) for f in sorted(files)]
+    return hashlib.sha1(repr(stats).encode()).hexdigest()[:16]
+
+def _listed_files(path):
+    if os.path.isfile(path): return [path]
+    return [os.path.join(root, name) for root, _, names in os.walk(path) for name in names]
+
+# Open file sources by (path, format), reused while no file under the path changed, so their
+# per-selection newest times are not recomputed on every run.
+_open_sources = {}
+
+def open_data_source(settings, connections, resolution=None, query_gate=None, cancellable=None):
+    """
+    Returns the DataSource the settings ask for: the files under 'data_path', or otherwise the
+    InfluxDB bucket through `connections`, with reads ending at the forming bar of `resolution`.
+    """
+    if not settings.get('data_path'):
+        return InfluxDataSource(settings, connections, resolution, query_gate, cancellable)
+    key = (settings['data_path'], settings.get('data_format'))
+    listing = _files_fingerprint(_listed_files(settings['data_path']))
+    cached = _open_sources.get(key)
+    if cached is None or cached[0] != listing:
+        logging.info(f"Reading candles from files in {settings['data_path']}")
+        _open_sources[key] = (listing, FileDataSource(*key))
+    return _open_sources[key][1]
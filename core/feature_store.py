@@ -0,0 +1,148 @@
+# core/feature_store.py
+# Incremental per-broker feature state built on mergeable quantile sketches.
+
+import numpy as np
+import pandas as pd
+
+from core.sketches import QuantileSketch
+
+FEATURE_COLUMNS = ['Gap_Median', 'Spike_Median', 'Spike_Max', 'Gap_Max']
+
+class BrokerFeatureState:
+    """
+    Mergeable running state behind the four OHLC features of one broker series:
+    gap/spike quantile sketches, running maxima and the last candle seen.
+    """
+    def __init__(self, relative_accuracy=0.01):
+        self.gap_sketch = QuantileSketch(relative_accuracy)
+        self.spike_sketch = QuantileSketch(relative_accuracy)
+        self.gap_max = np.nan
+        self.spike_max = np.nan
+        self.points = 0
+        self.last_close = np.nan
+        self.last_time = None
+
+    def update(self, times, opens, highs, lows, closes):
+        """Folds time-ordered candles in; candles at or before the last seen time are ignored."""
+        if self.last_time is not None:
+            newer = times > self.last_time
+            times, opens, highs, lows, closes = times[newer], opens[newer], highs[newer], lows[newer], closes[newer]
+        if len(times) == 0:
+            return
+
+        prev_close = np.empty_like(closes)
+        prev_close[0] = self.last_close
+        prev_close[1:] = closes[:-1]
+        gap = np.abs(opens - prev_close)
+        spike = (highs - lows) / (np.abs(opens - closes) + 1e-9)
+
+        self.gap_sketch.update(gap)
+        self.spike_sketch.update(spike)
+        valid_gap = gap[~np.isnan(gap)]
+        if valid_gap.size:
+            self.gap_max = np.fmax(self.gap_max, valid_gap.max())
+        self.spike_max = np.fmax(self.spike_max, spike.max())
+        self.points += len(times)
+        self.last_close = closes[-1]
+        self.last_time = times[-1]
+
+    def merge(self, other):
+        """Combines the state of a disjoint stretch of the same series."""
+        self.gap_sketch.merge(other.gap_sketch)
+        self.spike_sketch.merge(other.spike_sketch)
+        self.gap_max = np.fmax(self.gap_max, other.gap_max)
+        self.spike_max = np.fmax(self.spike_max, other.spike_max)
+        self.points += other.points
+        if other.last_time is not None and (self.last_time is None or other.last_time > self.last_time):
+            self.last_close, self.last_time = other.last_close, other.last_time
+
+    def features(self):
+        return {
+            'Gap_Median': self.gap_sketch.quantile(0.5), 'Spike_Median': self.spike_sketch.quantile(0.5),
+            'Spike_Max': self.spike_max, 'Gap_Max': self.gap_max
+        }
+
+class IncrementalFeatureStore:
+    """
+    Keeps one BrokerFeatureState per (broker, symbol, period). New candles are folded in with
+    O(1) memory per broker and the features can be read out at any time.
+    """
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self._states = {}
+
+    def state(self, broker, symbol, period):
+        key = (broker, symbol, period)
+        if key not in self._states:
+            self._states[key] = BrokerFeatureState(self.relative_accuracy)
+        return self._states[key]
+
+    def _series_state(self, broker, symbol, period):
+        """The state the features of one series are read from, or None if nothing was folded in."""
+        return self._states.get((broker, symbol, period))
+
+    def update(self, candles_df, symbol, period):
+        """Folds a candle chunk (any number of brokers, time-ordered per broker) into the store."""
+        for broker, broker_df in candles_df.groupby('broker', sort=False, observed=True):
+            self.state(broker, symbol, period).update(
+                broker_df['_time'].to_numpy(dtype='datetime64[ns]'), *(broker_df[col].to_numpy(dtype=np.float64) for col in ['open', 'high', 'low', 'close'])
+            )
+
+    def features(self, brokers, symbol, period, min_points):
+        """Returns the feature frame for every listed broker with at least `min_points` candles."""
+        features_list = []
+        for broker in brokers:
+            state = self._series_state(broker, symbol, period)
+            if state is None or state.points < min_points: continue
+            features_list.append({'broker': broker, **state.features()})
+        if not features_list: raise ValueError(f"No broker had enough data.")
+        return pd.DataFrame(features_list).set_index('broker')[FEATURE_COLUMNS]
+
+class WindowedFeatureStore(IncrementalFeatureStore):
+    """
+    IncrementalFeatureStore over a moving window: each series keeps one BrokerFeatureState per
+    `bucket` of time, the features merge the buckets that are left, and expire() drops the buckets
+    that fell out of the window, so the window moves forward without re-reading it.
+    """
+    def __init__(self, bucket=pd.Timedelta(days=1), relative_accuracy=0.01):
+        super().__init__(relative_accuracy)
+        self.bucket = bucket
+
+    def state(self, broker, symbol, period):
+        """A merged copy of the series' buckets; candles are folded in through update()."""
+        return self._series_state(broker, symbol, period) or BrokerFeatureState(self.relative_accuracy)
+
+    def update(self, candles_df, symbol, period):
+        for broker, broker_df in candles_df.groupby('broker', sort=False, observed=True):
+            times = broker_df['_time'].to_numpy(dtype='datetime64[ns]')
+            values = [broker_df[col].to_numpy(dtype=np.float64) for col in ['open', 'high', 'low', 'close']]
+            buckets = times.view(np.int64) // self.bucket.value
+            starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+            series = self._states.setdefault((broker, symbol, period), {})
+            for start, stop in zip(starts, np.r_[starts[1:], len(times)]):
+                self._bucket_state(series, int(buckets[start])).update(times[start:stop], *(v[start:stop] for v in values))
+
+    def _bucket_state(self, series, bucket):
+        if bucket not in series:
+            state = series[bucket] = BrokerFeatureState(self.relative_accuracy)
+            # The first gap of a bucket is measured from the last close of the bucket before it.
+            previous = max((b for b in series if b < bucket), default=None)
+            if previous is not None:
+                state.last_close, state.last_time = series[previous].last_close, series[previous].last_time
+        return series[bucket]
+
+    def _series_state(self, broker, symbol, period):
+        series = self._states.get((broker, symbol, period))
+        if not series: return None
+        merged = BrokerFeatureState(self.relative_accuracy)
+        for bucket in sorted(series):
+            merged.merge(series[bucket])
+        return merged
+
+    def expire(self, since):
+        """Drops the buckets that end at or before `since`; the bucket holding `since` is kept whole."""
+        oldest = pd.Timestamp(since).value // self.bucket.value
+        for key, series in list(self._states.items()):
+            for bucket in [b for b in series if b < oldest]:
+                del series[bucket]
+            if not series: del self._states[key]
@@ -0,0 +1,72 @@
+# core/ingest.py
+# Streaming conversion of Flux query records into compact candle chunks.
+
+import numpy as np
+import pandas as pd
+
+OHLC_COLUMNS = ['open', 'high', 'low', 'close']
+CHUNK_ROWS = 50_000
+
+def _to_frame(buffer, brokers, price_dtype):
+    times, broker_names, opens, highs, lows, closes = zip(*buffer)
+    chunk = pd.DataFrame({
+        '_time': pd.to_datetime(list(times), utc=True),
+        'broker': pd.Categorical(broker_names, categories=brokers),
+    })
+    for col, values in zip(OHLC_COLUMNS, (opens, highs, lows, closes)):
+        chunk[col] = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').astype(price_dtype)
+    return chunk.dropna(subset=['broker'] + OHLC_COLUMNS)
+
+def iter_candle_chunks(records, brokers, chunk_rows=CHUNK_ROWS, price_dtype='float64'):
+    """
+    Groups streamed, already pivoted Flux records into typed candle DataFrames of at most
+    `chunk_rows` rows: UTC datetime64 time, categorical broker and numeric OHLC columns.
+    """
+    buffer = []
+    for record in records:
+        values = record.values
+        buffer.append((values['_time'], values['broker'], values.get('open'),
+                       values.get('high'), values.get('low'), values.get('close')))
+        if len(buffer) >= chunk_rows:
+            yield _to_frame(buffer, brokers, price_dtype)
+            buffer = []
+    if buffer:
+        yield _to_frame(buffer, brokers, price_dtype)
+
+class FeatureAccumulator:
+    """
+    Builds the per-broker gap/spike features from time-ordered candle chunks without
+    keeping the candles: only the last close and the gap/spike values of each broker are retained.
+    """
+    def __init__(self):
+        self._last_close = {}
+        self._gaps = {}
+        self._spikes = {}
+
+    def update(self, chunk):
+        for broker, broker_df in chunk.groupby('broker', sort=False, observed=True):
+            opens = broker_df['open'].to_numpy(dtype=np.float64)
+            closes = broker_df['close'].to_numpy(dtype=np.float64)
+            prev_close = np.empty_like(closes)
+            prev_close[0] = self._last_close.get(broker, np.nan)
+            prev_close[1:] = closes[:-1]
+            gap = np.abs(opens - prev_close)
+            spike = (broker_df['high'].to_numpy(dtype=np.float64) - broker_df['low'].to_numpy(dtype=np.float64)) / (np.abs(opens - closes) + 1e-9)
+
+            self._gaps.setdefault(broker, []).append(gap[~np.isnan(gap)])
+            self._spikes.setdefault(broker, []).append(spike)
+            self._last_close[broker] = closes[-1]
+
+    def finalize(self, min_points):
+        """Returns the feature frame for every broker with at least `min_points` candles."""
+        features_list = []
+        for broker, spike_parts in self._spikes.items():
+            spike = np.concatenate(spike_parts)
+            if len(spike) < min_points: continue
+            gap = np.concatenate(self._gaps[broker])
+            features_list.append({
+                'broker': broker, 'Gap_Median': np.median(gap) if gap.size else np.nan, 'Spike_Median': np.median(spike),
+                'Spike_Max': spike.max(), 'Gap_Max': gap.max() if gap.size else np.nan
+            })
+        if not features_list: raise ValueError(f"No broker had enough data.")
+        return pd.DataFrame(features_list).set_index('broker')
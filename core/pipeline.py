@@ -0,0 +1,495 @@
+# core/pipeline.py
+# Qt-independent analysis pipeline shared by the desktop app and the batch runner.
+
+import logging
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import numpy as np
+
+from core.clustering import ClusteringEngine
+from core.connection import InfluxConnectionPool
+from core.data_cache import CandleCache
+from core.candle_store import CandleStore
+from core.feature_store import IncrementalFeatureStore, WindowedFeatureStore
+from core.ingest import FeatureAccumulator
+from core.profiling import StageProfiler, write_profile_jsonl
+from core.cancellation import AnalysisCancelled
+from core.symbols import SymbolRegistry, DEFAULT_REGISTRY_PATH
+from core.result_store import ResultStore, DEFAULT_RESULT_STORE_PATH
+from core.data_sources import open_data_source
+from core.consensus import consensus_features
+from core.ticks import TICK_BUFFER_ROWS, TICK_QUERY_WINDOW, TickAccumulator, TickRingBuffer
+from core.rollups import choose_resolution, resolution_delta
+
+# Defaults for the 'lookback_days' and 'resolution' settings; 'auto' picks the coarsest resolution that meets min_points.
+LOOKBACK_DAYS = 30
+DEFAULT_RESOLUTION = 'auto'
+# A cached broker whose first candle starts later than this after the lookback start is fetched again in full
+# (the slack covers weekends and holidays at the start of the window).
+CACHE_COVERAGE_SLACK = pd.Timedelta(days=3)
+# Cached bars older than this (before the window end) are dropped when a broker's entry is rewritten.
+CACHE_RETENTION = pd.Timedelta(days=3650)
+QUERY_PARALLELISM = 4
+# Streamed records between two cancellation checks.
+CANCEL_CHECK_ROWS = 2_000
+# Live mode reclusters once a broker's scaled features drift by more than this many standard deviations.
+LIVE_RECLUSTER_THRESHOLD = 0.25
+
+class AnalysisPipeline:
+    """
+    Handles all data processing, machine learning, and database interactions.
+    Progress and intermediate data are reported through overridable hooks, so the
+    same pipeline can run behind the GUI or headless.
+    """
+    def __init__(self):
+        self.settings = {}
+        # Held for the duration of every single DB query; the batch runner swaps in a shared semaphore.
+        self.query_gate = nullcontext()
+        # Set to a ComputePool to run clustering and client-mode feature extraction in a separate process.
+        # Building the CandleStore and the streaming/sketch folds stay in this process, next to the reads.
+        self.compute_pool = None
+        self.clustering = ClusteringEngine()
+        self.connections = InfluxConnectionPool()
+        self.profiler = StageProfiler()
+        # CancelToken of the current run, checked between stages and query chunks.
+        self.cancel_token = None
+        self.symbol_registry = None
+        self.result_store = None
+        # DataSource of the current run (InfluxDB or files), opened from the settings.
+        self.data_source = None
+
+    def _report_progress(self, value, message):
+        logging.info(f"[{value:3d}%] {message}")
+
+    def _publish_data(self, candles):
+        """Called with the cleaned CandleStore when the client-side path loaded it."""
+
+    def _publish_profile(self, profile_df):
+        """Called with the per-stage timings once a run has finished."""
+        for record in profile_df.itertuples():
+            logging.info(f"{record.stage}: {record.wall_s:.3f}s wall, {record.cpu_s:.3f}s CPU, rows={record.rows}")
+
+    def _check_cancelled(self):
+        if self.cancel_token is not None:
+            self.cancel_token.raise_if_cancelled()
+
+    def _cancellable(self, records):
+        """Passes streamed records through, checking for cancellation every CANCEL_CHECK_ROWS records."""
+        for i, record in enumerate(records):
+            if i % CANCEL_CHECK_ROWS == 0:
+                self._check_cancelled()
+            yield record
+
+    def _open_data_source(self, settings, resolution=None):
+        return open_data_source(settings, self.connections, resolution, self.query_gate, self._cancellable)
+
+    def _read_candles(self, brokers, start, stop=None):
+        """The selected symbol's candles of `brokers` in [start, stop) from the run's data source, as typed chunks."""
+        return self.data_source.candle_chunks(
+            brokers, self.settings['symbol_map'][self.settings['base_symbol']], self.settings['timeframe'], start, stop,
+            self._resolution(), self.settings['brokers'], self.settings.get('price_dtype', 'float64'))
+
+    def _lookback_days(self):
+        return self.settings.get('lookback_days', LOOKBACK_DAYS)
+
+    def _resolution(self):
+        """The candle resolution of this run: the configured one, or the coarsest that meets min_points."""
+        resolution = self.settings.get('resolution', DEFAULT_RESOLUTION)
+        if resolution == 'auto':
+            return choose_resolution(self._lookback_days(), self.settings['min_points'], self.settings.get('timeframe'))
+        return resolution
+
+    def _symbol_registry(self, settings):
+        path = settings.get('symbol_registry', DEFAULT_REGISTRY_PATH)
+        if self.symbol_registry is None or self.symbol_registry.path != path:
+            self.symbol_registry = SymbolRegistry(path)
+        return self.symbol_registry
+
+    def _result_store(self, settings):
+        path = settings.get('result_store', DEFAULT_RESULT_STORE_PATH)
+        if path is None:
+            return None
+        if self.result_store is None or self.result_store.path != path:
+            self.result_store = ResultStore(path)
+        return self.result_store
+
+    def _window_end(self):
+        """Where the lookback window ends: the data source's end of the selected data."""
+        return self.data_source.newest_time(self.settings['brokers'], self.settings['symbol_map'][self.settings['base_symbol']],
+                                            self.settings['timeframe'])
+
+    def _window_start(self):
+        return self._window_end() - pd.Timedelta(days=self._lookback_days())
+
+    def _data_fingerprint(self):
+        """
+        Identifies the data a run sees: the run's resolution, the end of its window floored to it and
+        the data source's fingerprint of the selected data in the window.
+        """
+        resolution = self._resolution()
+        source_fingerprint = self.data_source.fingerprint(self.settings['brokers'], self.settings['symbol_map'][self.settings['base_symbol']],
+                                                          self.settings['timeframe'], self._window_start())
+        return f"{resolution}@{self._window_end().floor(resolution_delta(resolution)).isoformat()}#{source_fingerprint}"
+
+    def load_metadata(self, settings):
+        """Fetches and normalizes available brokers, symbols, and timeframes."""
+        metadata = {'brokers': [], 'symbol_map': {}, 'timeframes': []}
+        self._report_progress(20, "Opening the data source to fetch metadata...")
+        source = self._open_data_source(settings)
+
+        self._report_progress(40, "Fetching brokers, symbols and timeframes...")
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            brokers, raw_symbols, timeframes = executor.map(source.tag_values, ["broker", "symbol", "period"])
+
+        self._report_progress(80, "Normalizing symbols...")
+        registry = self._symbol_registry(settings)
+        if settings.get('symbol_suffixes') is not None:
+            registry.set_suffix_rules(settings['symbol_suffixes'])
+        if registry.update(raw_symbols):
+            registry.save()
+        metadata['brokers'] = brokers
+        metadata['symbol_map'] = registry.symbol_map(raw_symbols)
+        metadata['timeframes'] = timeframes
+
+        if not metadata['brokers']: raise ValueError("No brokers found.")
+        if not metadata['symbol_map']: raise ValueError("No symbols found.")
+
+        self._report_progress(100, "Metadata fetched successfully.")
+        return metadata
+
+    def analyze(self, settings):
+        """Runs the full analysis pipeline and returns (final_report, pca_df)."""
+        self.settings = settings
+        self.data_source = self._open_data_source(settings, self._resolution())
+        profiler = self.profiler
+        profiler.start_run(track_memory=self.settings.get('profile_memory', False))
+        store = self._result_store(self.settings)
+        fingerprint = self._data_fingerprint() if store is not None else None
+        if store is not None and self.settings.get('reuse_results', True):
+            with profiler.stage('_load_stored_result') as stage:
+                stored = store.lookup(self.settings, fingerprint)
+                stage['rows'] = 0 if stored is None else len(stored[0])
+            if stored is not None:
+                self._publish_profile(profiler.to_frame())
+                self._report_progress(100, "Loaded the stored result of an identical analysis.")
+                return stored
+
+        features_df = None
+        if self.settings.get('consensus_features') and self.settings.get('processing_mode') in ('server', 'streaming', 'sketch'):
+            logging.info("Consensus features need all brokers' candles in memory; they are only computed client-side.")
+        if self.settings.get('processing_mode') == 'server':
+            self._report_progress(5, "Computing features on the server...")
+            try:
+                with profiler.stage('_get_server_features') as stage:
+                    features_df = self._get_server_features()
+                    stage['rows'] = len(features_df)
+            except (ValueError, AnalysisCancelled):
+                raise
+            except NotImplementedError as e:
+                logging.info(f"{e}; processing client-side.")
+            except Exception as e:
+                logging.warning(f"Server-side aggregation failed, falling back to client-side processing: {e}")
+
+        if features_df is None and self.settings.get('processing_mode') in ('streaming', 'sketch'):
+            self._report_progress(5, "Streaming candles and extracting features...")
+            with profiler.stage('_stream_features') as stage:
+                features_df = self._stream_features()
+                stage['rows'] = len(features_df)
+
+        if features_df is None:
+            self._report_progress(5, "Loading candles...")
+            with profiler.stage('_get_data') as stage:
+                candles = self._get_data()
+                stage['rows'] = len(candles)
+            self._check_cancelled()
+            self._publish_data(candles)
+
+            self._report_progress(25, "Extracting features...")
+            with profiler.stage('_extract_ohlc_features') as stage:
+                stage['rows'] = len(candles)
+                if self.compute_pool is not None:
+                    features_df = self.compute_pool.extract_features(candles, self.settings, self.cancel_token)
+                else:
+                    features_df = self._extract_ohlc_features(candles)
+
+        if self.settings.get('tick_features'):
+            self._report_progress(40, "Reading ticks and extracting spread features...")
+            try:
+                with profiler.stage('_get_tick_features') as stage:
+                    tick_features = self._get_tick_features()
+                    stage['rows'] = len(tick_features)
+            except NotImplementedError as e:
+                logging.info(f"{e}; tick features are skipped.")
+            else:
+                features_df = features_df.join(tick_features, how='inner')
+
+        if len(features_df) < self.settings['min_brokers']:
+            raise ValueError(f"Clustering requires at least {self.settings['min_brokers']} brokers.")
+
+        self._check_cancelled()
+        self._report_progress(50, "Performing clustering...")
+        with profiler.stage('_perform_clustering') as stage:
+            stage['rows'] = len(features_df)
+            result_df, projection = self._cluster(features_df)
+
+        self._check_cancelled()
+        self._report_progress(75, "Preparing visualization data...")
+        with profiler.stage('_interpret_clusters') as stage:
+            stage['rows'] = len(result_df)
+            profile_map = self._interpret_clusters(result_df)
+        with profiler.stage('_prepare_visualization_data') as stage:
+            stage['rows'] = len(result_df)
+            final_report, pca_df_for_plot = self._build_results(result_df, profile_map, projection)
+
+        if store is not None:
+            store.save(self.settings, fingerprint, final_report, pca_df_for_plot)
+        profile_df = profiler.to_frame()
+        if self.settings.get('profile_log'):
+            write_profile_jsonl(profile_df, self.settings['profile_log'], symbol=self.settings['base_symbol'],
+                                timeframe=self.settings['timeframe'], processing_mode=self.settings.get('processing_mode', 'client'))
+        self._publish_profile(profile_df)
+        self._report_progress(100, "Analysis complete.")
+        return final_report, pca_df_for_plot
+
+    def _cluster(self, features_df):
+        if self.compute_pool is not None:
+            return self.compute_pool.perform_clustering(features_df, self.settings, self.cancel_token)
+        return self._perform_clustering(features_df)
+
+    def _build_results(self, result_df, profile_map, projection):
+        """Returns (final_report, pca_df) from the clustered features."""
+        final_report = result_df.copy()
+        final_report['Profile'] = final_report['Cluster'].map(profile_map)
+        final_report.sort_values('Cluster', inplace=True)
+        return final_report, self._prepare_visualization_data(result_df, profile_map, projection)
+
+    def start_live(self, settings):
+        """
+        Starts live monitoring: loads the lookback window into a fresh windowed feature store, one
+        bucket per day, and clusters it. Returns (final_report, pca_df).
+        """
+        self.settings = settings
+        self.data_source = self._open_data_source(settings, self._resolution())
+        self.live_store = WindowedFeatureStore()
+        self._live_state = None
+        self._live_until = pd.Timestamp.now(tz='UTC').floor(resolution_delta(self._resolution()))
+        if settings.get('tick_features'):
+            logging.info("Tick features are not tracked in live mode; run a full analysis to include them.")
+        self._report_progress(5, "Loading the live window...")
+        self._fold_live(self._window_start(), self._live_until)
+        final_report, pca_df, _ = self._update_live_clusters()
+        self._report_progress(100, "Live monitoring started.")
+        return final_report, pca_df
+
+    def refresh_live(self):
+        """
+        Folds in only the bars completed since the last refresh and drops the days that left the
+        lookback window. Returns (final_report, pca_df, reclustered), or None if no new bar has
+        completed yet.
+        """
+        until = pd.Timestamp.now(tz='UTC').floor(resolution_delta(self._resolution()))
+        if until <= self._live_until:
+            return None
+        self._fold_live(self._live_until, until)
+        self._live_until = until
+        self.live_store.expire(until - pd.Timedelta(days=self._lookback_days()))
+        return self._update_live_clusters()
+
+    def _fold_live(self, start, stop):
+        # Stopping at a window boundary means only completed bars are folded into the sketches.
+        symbol, period = self.settings['base_symbol'], self.settings['timeframe']
+        for chunk in self._read_candles(self.settings['brokers'], start, stop):
+            self._check_cancelled()
+            self.live_store.update(chunk, symbol, period)
+
+    def _update_live_clusters(self):
+        """
+        Reclusters only when the broker set changed or some broker's scaled features moved by more
+        than `live_threshold` standard deviations; otherwise keeps the clusters and reprojects the points.
+        """
+        features_df = self.live_store.features(self.settings['brokers'], self.settings['base_symbol'],
+                                               self.settings['timeframe'], self.settings['min_points'])
+        if len(features_df) < self.settings['min_brokers']:
+            raise ValueError(f"Clustering requires at least {self.settings['min_brokers']} brokers.")
+
+        state = self._live_state
+        reclustered = state is None or not features_df.index.equals(state['features'].index)
+        if not reclustered:
+            scaler = state['projection'][2].named_steps['scale']
+            drift = np.abs(scaler.transform(features_df) - scaler.transform(state['features'])).max()
+            reclustered = drift > self.settings.get('live_threshold', LIVE_RECLUSTER_THRESHOLD)
+
+        if reclustered:
+            result_df, projection = self._cluster(features_df)
+            profile_map = self._interpret_clusters(result_df)
+            self._live_state = {'features': features_df, 'result': result_df, 'projection': projection, 'profile_map': profile_map}
+        else:
+            result_df = features_df.copy()
+            result_df['Cluster'] = state['result']['Cluster']
+            _, explained_variance, projector = state['projection']
+            projection = (projector.transform(features_df), explained_variance, projector)
+            profile_map = state['profile_map']
+
+        final_report, pca_df = self._build_results(result_df, profile_map, projection)
+        return final_report, pca_df, reclustered
+
+    def _get_data(self):
+        """
+        Returns a CandleStore of cleaned candles for the selected brokers, reading what is already
+        cached on disk and only querying the data source for bars newer than the newest cached point.
+        """
+        bucket, timeframe = self.settings['bucket'], self.settings['timeframe']
+        symbol_variations = self.settings['symbol_map'][self.settings['base_symbol']]
+        # Local data is read as fast as the cache, so only remote sources go through it.
+        use_cache = self.settings.get('use_cache', True) and self.data_source.remote
+        cache = CandleCache(self.settings.get('cache_dir')) if use_cache else None
+        resolution, price_dtype = self._resolution(), self.settings.get('price_dtype', 'float64')
+        window_start = self._window_start()
+
+        stored, cached = {}, {}
+        if cache:
+            for broker in self.settings['brokers']:
+                broker_df = cache.load(bucket, broker, symbol_variations, timeframe, resolution, price_dtype)
+                if broker_df is None: continue
+                stored[broker] = broker_df
+                # A cache filled for a shorter lookback does not cover the window; that broker is fetched in full.
+                if broker_df['_time'].min() <= window_start + CACHE_COVERAGE_SLACK:
+                    cached[broker] = broker_df
+        missing = [b for b in self.settings['brokers'] if b not in cached]
+
+        frames = []
+        if missing:
+            frames.extend(self._query_candles_parallel(missing, window_start))
+        if cached:
+            # Re-fetch the newest cached window as well, since it may have been a still-forming bar.
+            step = resolution_delta(resolution)
+            since = min(df['_time'].max() for df in cached.values()).floor(step) - step
+            frames.extend(df[df['_time'] <= since] for df in cached.values())
+            frames.extend(self._query_candles_parallel(list(cached), since))
+
+        frames = [f for f in frames if not f.empty]
+        if not frames: raise ValueError("Query returned no data for the selected symbols and brokers.")
+        # The chunks go straight into the compact arrays; no intermediate concatenated frame is built.
+        candles = CandleStore.from_frames(frames, self.settings['brokers'], price_dtype,
+                                          since=window_start)
+        del frames, cached
+        if len(candles) == 0: raise ValueError("No valid OHLC data remained after cleaning.")
+
+        if cache:
+            retain_from = self._window_end() - CACHE_RETENTION
+            for broker, count in candles.counts().items():
+                if not count: continue
+                broker_df = candles.frame([broker])
+                # The store only holds this run's window; bars cached by a longer lookback are kept in front of it.
+                older = stored.get(broker)
+                if older is not None:
+                    older = older[(older['_time'] >= retain_from) & (older['_time'] < broker_df['_time'].min())]
+                    broker_df = pd.concat([older, broker_df], ignore_index=True)
+                cache.store(bucket, broker, symbol_variations, timeframe, broker_df, resolution, price_dtype)
+        return candles
+
+    def _query_candles(self, brokers, start, stop=None):
+        """Reads OHLC candles for the given brokers in [start, stop) as a list of typed chunks."""
+        chunks = []
+        for chunk in self._read_candles(brokers, start, stop):
+            # Raising here drops the stream, which closes its HTTP response.
+            self._check_cancelled()
+            if not chunk.empty: chunks.append(chunk)
+        return chunks
+
+    def _query_candles_parallel(self, brokers, start, stop=None):
+        """Splits the brokers into groups and reads them concurrently from the data source."""
+        parallelism = max(1, self.settings.get('query_parallelism', QUERY_PARALLELISM))
+        group_size = -(-len(brokers) // parallelism)
+        groups = [brokers[i:i + group_size] for i in range(0, len(brokers), group_size)]
+        if len(groups) == 1: return self._query_candles(brokers, start, stop)
+
+        with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+            return [chunk for chunks in executor.map(lambda group: self._query_candles(group, start, stop), groups) for chunk in chunks]
+
+    def _stream_features(self):
+        """
+        Low-memory path: folds each streamed chunk straight into the feature stage,
+        so the full candle table is never materialized. In 'sketch' mode the medians come from
+        quantile sketches, which keeps memory per broker constant instead of linear in candles.
+        """
+        if self.settings.get('processing_mode') == 'sketch':
+            symbol, period = self.settings['base_symbol'], self.settings['timeframe']
+            store = IncrementalFeatureStore()
+            for chunk in self._read_candles(self.settings['brokers'], self._window_start()):
+                self._check_cancelled()
+                store.update(chunk, symbol, period)
+            return store.features(self.settings['brokers'], symbol, period, self.settings['min_points'])
+
+        accumulator = FeatureAccumulator()
+        for chunk in self._read_candles(self.settings['brokers'], self._window_start()):
+            self._check_cancelled()
+            accumulator.update(chunk)
+        return accumulator.finalize(self.settings['min_points'])
+
+    def _get_tick_features(self):
+        """
+        Folds the selected brokers' bid/ask ticks over the lookback window into spread, quote-rate and
+        stale-quote features. Ticks are queried one TICK_QUERY_WINDOW at a time and staged in a fixed-size
+        memory-mapped ring buffer, so memory stays bounded however many ticks a broker has.
+        """
+        brokers, symbols = self.settings['brokers'], self.settings['symbol_map'][self.settings['base_symbol']]
+        accumulator = TickAccumulator(brokers)
+        window_start, window_end = self._window_start(), self._window_end()
+        with TickRingBuffer(self.settings.get('tick_buffer_rows', TICK_BUFFER_ROWS)) as ring:
+            while window_start < window_end:
+                stop = min(window_start + TICK_QUERY_WINDOW, window_end)
+                ring.fold(self.data_source.tick_chunks(brokers, symbols, window_start, stop), accumulator)
+                window_start = stop
+            accumulator.update(ring.drain())
+        return accumulator.finalize(self.settings['min_points'])
+
+    def _get_server_features(self):
+        """Per-broker features aggregated by the data source itself, so only the aggregates are transferred."""
+        df = self.data_source.server_features(self.settings['brokers'], self.settings['symbol_map'][self.settings['base_symbol']],
+                                              self.settings['timeframe'], self._window_start(), self._resolution())
+        if df.empty: raise ValueError("Query returned no data for the selected symbols and brokers.")
+
+        df = df[df['Points'] >= self.settings['min_points']]
+        if df.empty: raise ValueError(f"No broker had enough data.")
+        return df.drop(columns='Points')
+
+    def _extract_ohlc_features(self, candles):
+        """
+        Computes per-broker gap/spike statistics on views into the CandleStore arrays,
+        in the store's broker order, plus the cross-broker consensus features when enabled.
+        """
+        features = candles.features(self.settings['min_points'])
+        if self.settings.get('consensus_features'):
+            features = features.join(consensus_features(candles), how='inner')
+        return features
+
+    def _perform_clustering(self, features_df):
+        """
+        Clusters the brokers and returns (result_df, projection), where projection holds the
+        2D PCA components, explained variance and fitted projector from the same scaled matrix.
+        """
+        labels, components, explained_variance, projector = self.clustering.run(features_df)
+        result_df = features_df.copy()
+        result_df['Cluster'] = labels
+        return result_df, (components, explained_variance, projector)
+
+    def _interpret_clusters(self, result_df):
+        cluster_profiles = result_df.groupby('Cluster').mean()
+        cluster_profiles['Gap_Rank'] = cluster_profiles['Gap_Median'].rank()
+        cluster_profiles['Spike_Rank'] = cluster_profiles['Spike_Median'].rank()
+        cluster_profiles['Overall_Rank'] = cluster_profiles['Gap_Rank'] + cluster_profiles['Spike_Rank']
+        quality_map = {1: "Excellent Quality", 2: "Good Quality", 3: "Standard Quality", 4: "High Risk"}
+        cluster_profiles['Profile_Name'] = cluster_profiles['Overall_Rank'].rank(method='dense').map(quality_map).fillna("General")
+        return cluster_profiles['Profile_Name'].to_dict()
+
+    def _prepare_visualization_data(self, result_df, profile_map, projection):
+        """Prepares the DataFrame for plotting in the GUI."""
+        components, explained_variance, _ = projection
+        pca_df = pd.DataFrame(data=components, columns=['PC1', 'PC2'], index=result_df.index)
+        pca_df['Cluster'] = result_df['Cluster']
+        pca_df['Profile'] = pca_df['Cluster'].map(profile_map)
+        
+        pca_df.attrs['explained_variance'] = explained_variance
+        return pca_df
@@ -0,0 +1,62 @@
+# core/profiling.py
+# Per-stage wall time, CPU time, row counts and peak memory of an analysis run.
+
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+import pandas as pd
+
+PROFILE_COLUMNS = ['run_id', 'started_at', 'stage', 'wall_s', 'cpu_s', 'rows', 'peak_mem_mb']
+
+class StageProfiler:
+    """
+    Records one row per pipeline stage. CPU time and peak memory cover the calling process
+    only, so stages handed to the compute pool show up mostly as wall time. Memory is traced
+    with tracemalloc, which slows allocation-heavy Python code severalfold, so it is opt-in.
+    """
+    def __init__(self, track_memory=False):
+        self.track_memory = track_memory
+        self.records = []
+        self.run_id = None
+
+    def start_run(self, track_memory=None):
+        if track_memory is not None:
+            self.track_memory = track_memory
+        self.records = []
+        self.run_id = pd.Timestamp.now(tz='UTC').strftime('%Y%m%dT%H%M%S.%fZ')
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Times the enclosed block. The yielded dict takes the number of rows the stage
+        processed as `rows`.
+        """
+        record = {'run_id': self.run_id, 'started_at': pd.Timestamp.now(tz='UTC').isoformat(), 'stage': name, 'rows': None}
+        started_tracing = self.track_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        elif self.track_memory:
+            tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0] if self.track_memory else 0
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record['wall_s'] = time.perf_counter() - wall
+            record['cpu_s'] = time.process_time() - cpu
+            record['peak_mem_mb'] = (tracemalloc.get_traced_memory()[1] - baseline) / 2**20 if self.track_memory else None
+            if started_tracing:
+                tracemalloc.stop()
+            self.records.append(record)
+
+    def to_frame(self):
+        return pd.DataFrame(self.records, columns=PROFILE_COLUMNS).astype({'rows': 'Int64'})
+
+def write_profile_jsonl(profile_df, path, **context):
+    """Appends one JSON object per stage to `path`, tagged with any extra context (e.g. symbol)."""
+    records = profile_df.astype(object).where(profile_df.notna(), None).to_dict('records')
+    lines = ''.join(json.dumps({**context, **record}, default=str) + '\n' for record in records)
+    # A single append keeps the lines of one run together when batch processes share the file.
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(lines)
@@ -0,0 +1,116 @@
+# core/result_store.py
+# SQLite store of finished analyses, for instant reopening and comparing runs over time.
+
+import io
+import os
+import json
+import sqlite3
+import hashlib
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+DEFAULT_RESULT_STORE_PATH = os.path.join(os.path.expanduser("~"), ".griffin", "results.sqlite")
+# Settings that change how a run executes or is logged, but not its result.
+NON_RESULT_SETTINGS = {'token', 'use_cache', 'cache_dir', 'query_parallelism', 'profile_log', 'profile_memory',
+                       'symbol_registry', 'symbol_suffixes', 'broker_universe', 'result_store', 'reuse_results',
+                       'tick_buffer_rows'}
+HISTORY_COLUMNS = ['run_id', 'created_at', 'symbol', 'timeframe', 'fingerprint', 'brokers']
+
+def result_key(settings):
+    """Hash of the result-relevant settings; only the analyzed symbol's variants are taken from symbol_map."""
+    relevant = {k: v for k, v in settings.items() if k not in NON_RESULT_SETTINGS}
+    if 'symbol_map' in relevant:
+        relevant['symbol_map'] = sorted(relevant['symbol_map'].get(settings.get('base_symbol'), []))
+    if 'brokers' in relevant:
+        relevant['brokers'] = sorted(relevant['brokers'])
+    return hashlib.sha1(json.dumps(relevant, sort_keys=True, default=str).encode()).hexdigest()
+
+def _to_blob(df):
+    buffer = io.BytesIO()
+    df = df.copy(deep=False)
+    df.attrs = {} # Stored in their own column; Parquet metadata only takes plain JSON.
+    df.to_parquet(buffer)
+    return buffer.getvalue()
+
+def _from_blob(blob):
+    return pd.read_parquet(io.BytesIO(blob))
+
+class ResultStore:
+    """
+    Keeps every finished analysis (final_report and pca_df) keyed by its settings and a data
+    fingerprint. A repeated analysis over the same data is answered from the store, and older runs
+    stay available for reopening and for comparing cluster assignments across dates.
+    Each call opens its own connection, so the store can be used from worker threads and processes.
+    """
+    def __init__(self, path=DEFAULT_RESULT_STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute('''CREATE TABLE IF NOT EXISTS runs (
+                run_id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL, fingerprint TEXT NOT NULL,
+                created_at TEXT NOT NULL, symbol TEXT, timeframe TEXT, brokers INTEGER, settings TEXT,
+                report BLOB NOT NULL, pca BLOB NOT NULL, explained_variance TEXT)''')
+            db.execute('CREATE INDEX IF NOT EXISTS runs_key ON runs (key, fingerprint)')
+
+    @contextmanager
+    def _connect(self):
+        """Yields a connection that commits on success and is always closed."""
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def save(self, settings, fingerprint, final_report, pca_df):
+        """Stores a finished run and returns its id."""
+        stored_settings = {k: v for k, v in settings.items() if k not in NON_RESULT_SETTINGS | {'symbol_map'}}
+        with self._connect() as db:
+            cursor = db.execute(
+                'INSERT INTO runs (key, fingerprint, created_at, symbol, timeframe, brokers, settings, report, pca, explained_variance) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (result_key(settings), fingerprint, pd.Timestamp.now(tz='UTC').isoformat(), settings.get('base_symbol'),
+                 settings.get('timeframe'), len(final_report), json.dumps(stored_settings, sort_keys=True, default=str),
+                 _to_blob(final_report), _to_blob(pca_df), json.dumps([float(v) for v in pca_df.attrs.get('explained_variance', [])])))
+            return cursor.lastrowid
+
+    def lookup(self, settings, fingerprint):
+        """Returns (final_report, pca_df) of the newest identical run over the same data, or None."""
+        with self._connect() as db:
+            row = db.execute('SELECT run_id FROM runs WHERE key = ? AND fingerprint = ? ORDER BY run_id DESC LIMIT 1',
+                             (result_key(settings), fingerprint)).fetchone()
+        return self.load(row[0]) if row else None
+
+    def load(self, run_id):
+        """Returns (final_report, pca_df) of a stored run."""
+        with self._connect() as db:
+            row = db.execute('SELECT report, pca, explained_variance FROM runs WHERE run_id = ?', (run_id,)).fetchone()
+        if row is None: raise ValueError(f"No stored analysis with id {run_id}.")
+        pca_df = _from_blob(row[1])
+        pca_df.attrs['explained_variance'] = np.array(json.loads(row[2]))
+        return _from_blob(row[0]), pca_df
+
+    def history(self, symbol=None, timeframe=None):
+        """Lists the stored runs, newest first, optionally for one symbol and/or timeframe."""
+        conditions, params = [], []
+        for column, value in [('symbol', symbol), ('timeframe', timeframe)]:
+            if value is not None:
+                conditions.append(f'{column} = ?')
+                params.append(value)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        with self._connect() as db:
+            rows = db.execute(f"SELECT {', '.join(HISTORY_COLUMNS)} FROM runs{where} ORDER BY run_id DESC", params).fetchall()
+        return pd.DataFrame(rows, columns=HISTORY_COLUMNS)
+
+    def assignments(self, run_ids, column='Profile'):
+        """
+        Returns a broker x run table of `column` for the given runs. Profiles are compared by default,
+        because cluster numbers are arbitrary from one run to the next.
+        """
+        history = self.history().set_index('run_id')
+        columns = {}
+        for run_id in run_ids:
+            report, _ = self.load(run_id)
+            columns[f"{run_id} ({history.at[run_id, 'created_at'][:16]})"] = report[column]
+        return pd.DataFrame(columns)
@@ -0,0 +1,91 @@
+# core/rollups.py
+# Multi-resolution OHLC rollups: Flux builders, resolution choice and InfluxDB task setup.
+
+import re
+import logging
+import pandas as pd
+
+# Finest first. Each resolution can be kept as a downsampled rollup bucket maintained by an InfluxDB task.
+RESOLUTIONS = ['1m', '1h', '1d']
+OHLC_AGGREGATES = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last'}
+# MetaTrader-style period tags (M1, M15, H1, H4, D1, W1, MN1).
+PERIOD_REGEX = re.compile(r'^(MN|M|H|D|W)(\d+)$')
+PERIOD_UNITS = {'M': 'min', 'H': 'h', 'D': 'D', 'W': 'W'}
+
+DURATION_UNITS = {'m': 'minutes', 'h': 'hours', 'd': 'days'}
+# FX trades five days out of seven; weekends carry no bars.
+FX_TRADING_SHARE = 5 / 7
+
+def resolution_delta(resolution):
+    """Length of a Flux duration such as '1m', '1h' or '30d'."""
+    count, unit = re.fullmatch(r'(\d+)([mhd])', resolution).groups()
+    return pd.Timedelta(**{DURATION_UNITS[unit]: int(count)})
+
+def period_delta(period):
+    """Bar length of a period tag such as 'H1', or None if it is not recognized."""
+    match = PERIOD_REGEX.match(str(period).upper())
+    if not match:
+        return None
+    unit, count = match.groups()
+    if unit == 'MN':
+        return pd.Timedelta(days=30 * int(count))
+    return pd.Timedelta(int(count), unit=PERIOD_UNITS[unit])
+
+def choose_resolution(lookback_days, min_points, period=None):
+    """
+    Returns the coarsest resolution that still yields `min_points` bars over the lookback. Bars are
+    counted in trading time (FX_TRADING_SHARE of the calendar), and a resolution finer than the source
+    period yields the native bars. If none qualifies, the coarsest one giving the most bars is returned.
+    """
+    trading_time = pd.Timedelta(days=lookback_days) * FX_TRADING_SHARE
+    bar = period_delta(period)
+    points = {r: trading_time / max(resolution_delta(r), bar or resolution_delta(r)) for r in RESOLUTIONS}
+    for resolution in reversed(RESOLUTIONS):
+        if points[resolution] >= min_points:
+            return resolution
+    most = max(points.values())
+    return next(r for r in reversed(RESOLUTIONS) if points[r] == most)
+
+def rollup_bucket(bucket, resolution):
+    return f"{bucket}_ohlc_{resolution}"
+
+def ohlc_window_query(bucket, range_args, predicate, every):
+    """
+    Flux expression that downsamples raw OHLC fields to `every` windows with proper OHLC semantics
+    (first open, max high, min low, last close). The output is unpivoted, one table per field.
+    """
+    streams = [
+        f'''from(bucket: "{bucket}")
+              |> range({range_args})
+              |> filter(fn: (r) => {predicate} and r["_field"] == "{field}")
+              |> aggregateWindow(every: {every}, fn: {fn}, createEmpty: false)'''
+        for field, fn in OHLC_AGGREGATES.items()
+    ]
+    return "union(tables: [\n            " + ",\n            ".join(streams) + "\n          ])"
+
+def rollup_task_flux(bucket, resolution, org):
+    """Task body that re-aggregates the last two windows of raw data into the rollup bucket."""
+    count, unit = re.match(r'(\d+)(\w+)', resolution).groups()
+    return f'''{ohlc_window_query(bucket, f"start: -{2 * int(count)}{unit}", 'r["_measurement"] == "price"', resolution)}
+          |> to(bucket: "{rollup_bucket(bucket, resolution)}", org: "{org}")'''
+
+def ensure_rollups(client, bucket, org, resolutions=RESOLUTIONS, backfill_days=None):
+    """
+    Creates the rollup bucket and the InfluxDB downsampling task of every resolution if missing.
+    With `backfill_days`, the rollups are also filled once from that much raw history.
+    """
+    buckets_api, tasks_api = client.buckets_api(), client.tasks_api()
+    organization = client.organizations_api().find_organizations(org=org)[0]
+    for resolution in resolutions:
+        name = rollup_bucket(bucket, resolution)
+        if buckets_api.find_bucket_by_name(name) is None:
+            buckets_api.create_bucket(bucket_name=name, org=org)
+            logging.info(f"Created rollup bucket {name}")
+        task_name = f"griffin-rollup-{name}"
+        if not tasks_api.find_tasks(name=task_name):
+            tasks_api.create_task_every(task_name, rollup_task_flux(bucket, resolution, org), resolution, organization)
+            logging.info(f"Created downsampling task {task_name}")
+        if backfill_days:
+            backfill = ohlc_window_query(bucket, f"start: -{backfill_days}d", 'r["_measurement"] == "price"', resolution)
+            client.query_api().query(f'{backfill}\n          |> to(bucket: "{name}", org: "{org}")')
+            logging.info(f"Backfilled {name} with {backfill_days} days of history")
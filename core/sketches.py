@@ -0,0 +1,91 @@
+# core/sketches.py
+# Mergeable quantile sketch for non-negative feature values.
+
+import math
+import numpy as np
+
+class QuantileSketch:
+    """
+    A DDSketch-style quantile sketch: values are counted in logarithmic buckets, so any
+    quantile is returned within `relative_accuracy` of the exact value (relative error),
+    updates are vectorized and two sketches merge by adding their bucket counts.
+    Memory is bounded by `max_bins`; past that the lowest buckets are collapsed.
+    """
+    def __init__(self, relative_accuracy=0.01, max_bins=2048):
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self._counts = np.zeros(0, dtype=np.int64)
+        self._min_key = 0
+        self.zero_count = 0
+        self.count = 0
+
+    def _extend(self, low_key, high_key):
+        if self._counts.size == 0:
+            self._min_key = low_key
+            self._counts = np.zeros(high_key - low_key + 1, dtype=np.int64)
+            return
+        max_key = self._min_key + self._counts.size - 1
+        new_min, new_max = min(low_key, self._min_key), max(high_key, max_key)
+        if new_min == self._min_key and new_max == max_key:
+            return
+        counts = np.zeros(new_max - new_min + 1, dtype=np.int64)
+        counts[self._min_key - new_min:self._min_key - new_min + self._counts.size] = self._counts
+        self._counts, self._min_key = counts, new_min
+
+    def _collapse(self):
+        excess = self._counts.size - self.max_bins
+        if excess > 0:
+            self._counts[excess] += self._counts[:excess].sum()
+            self._counts = self._counts[excess:]
+            self._min_key += excess
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+        positive = values[values > 0]
+        self.zero_count += values.size - positive.size
+        self.count += values.size
+        if positive.size == 0:
+            return
+        keys = np.ceil(np.log(positive) / self._log_gamma).astype(np.int64)
+        low_key, high_key = int(keys.min()), int(keys.max())
+        self._extend(low_key, high_key)
+        self._counts += np.bincount(keys - self._min_key, minlength=self._counts.size)
+        self._collapse()
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different accuracy.")
+        if other._counts.size:
+            self._extend(other._min_key, other._min_key + other._counts.size - 1)
+            offset = other._min_key - self._min_key
+            self._counts[offset:offset + other._counts.size] += other._counts
+            self._collapse()
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def _value_at(self, position):
+        """Estimates the value of the order statistic at 0-based `position`."""
+        if position < self.zero_count:
+            return 0.0
+        cumulative = np.cumsum(self._counts)
+        index = min(int(np.searchsorted(cumulative, position - self.zero_count, side='right')), self._counts.size - 1)
+        return 2 * self.gamma ** (self._min_key + index) / (self.gamma + 1)
+
+    def quantile(self, q):
+        """
+        Returns the estimated q-quantile, interpolated between order statistics the same way as
+        pandas, or NaN for an empty sketch.
+        """
+        if self.count == 0:
+            return np.nan
+        rank = q * (self.count - 1)
+        lower, fraction = int(math.floor(rank)), rank - math.floor(rank)
+        value = self._value_at(lower)
+        if fraction > 0:
+            value += fraction * (self._value_at(lower + 1) - value)
+        return value
@@ -0,0 +1,90 @@
+# core/symbols.py
+# Persistent registry that maps broker-specific symbol variants to their base symbol.
+
+import os
+import re
+import json
+import logging
+
+DEFAULT_REGISTRY_PATH = os.path.join(os.path.expanduser("~"), ".griffin", "symbols.json")
+# Base symbol = the leading six letters, e.g. 'EURUSD.c' or 'EURUSDm' -> 'EURUSD'.
+BASE_SYMBOL_REGEX = re.compile(r'([A-Z]{6})')
+
+class SymbolRegistry:
+    """
+    Alias index in both directions (base -> variants, variant -> base). New raw symbols are resolved
+    once and remembered on disk, so later metadata fetches only look at symbols never seen before.
+    User suffix rules (e.g. '.cash' so that 'US30.cash' -> 'US30') take precedence over the default
+    six-letter rule.
+    """
+    def __init__(self, path=DEFAULT_REGISTRY_PATH):
+        self.path = path
+        self.suffix_rules = []
+        self._base_of = {}
+        self._variants = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    data = json.load(f)
+                self.suffix_rules = data.get('suffix_rules', [])
+                for variant, base in data.get('aliases', {}).items():
+                    self._index(variant, base)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Ignoring unreadable symbol registry {path}: {e}")
+
+    def _index(self, variant, base):
+        self._base_of[variant] = base
+        variants = self._variants.setdefault(base, [])
+        if variant not in variants:
+            variants.append(variant)
+
+    def _resolve(self, symbol):
+        upper = symbol.upper()
+        for suffix in self.suffix_rules:
+            if len(upper) > len(suffix) and upper.endswith(suffix.upper()):
+                return symbol[:-len(suffix)].upper()
+        match = BASE_SYMBOL_REGEX.match(upper)
+        # Fallback for non-standard names: treat them as their own group.
+        return match.group(1) if match else symbol
+
+    def set_suffix_rules(self, rules):
+        """Replaces the user suffix rules (longest first wins) and re-resolves every known symbol."""
+        rules = sorted(set(rules), key=len, reverse=True)
+        if rules == self.suffix_rules:
+            return
+        self.suffix_rules = rules
+        known = list(self._base_of)
+        self._base_of, self._variants = {}, {}
+        self.update(known)
+        self.save()
+
+    def update(self, raw_symbols):
+        """Resolves and indexes the symbols not seen before; returns how many were added."""
+        new = [s for s in dict.fromkeys(raw_symbols) if s not in self._base_of]
+        for symbol in new:
+            self._index(symbol, self._resolve(symbol))
+        return len(new)
+
+    def base_of(self, symbol):
+        return self._base_of.get(symbol)
+
+    def variants(self, base):
+        return list(self._variants.get(base, []))
+
+    def symbol_map(self, raw_symbols=None):
+        """Returns {base: [variants]}, optionally restricted to the given raw symbols."""
+        if raw_symbols is None:
+            return {base: list(variants) for base, variants in self._variants.items()}
+        symbol_map = {}
+        for symbol in raw_symbols:
+            symbol_map.setdefault(self._base_of[symbol], []).append(symbol)
+        return symbol_map
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'suffix_rules': self.suffix_rules, 'aliases': self._base_of}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,168 @@
+# core/ticks.py
+# Bounded-memory tick pipeline: bid/ask quotes staged in a memory-mapped ring buffer and folded into spread features.
+
+import tempfile
+import numpy as np
+import pandas as pd
+
+from core.ingest import CHUNK_ROWS
+from core.sketches import QuantileSketch
+
+TICK_MEASUREMENT = 'tick'
+TICK_DTYPE = np.dtype([('time', np.int64), ('broker', np.int32), ('bid', np.float64), ('ask', np.float64)])
+# Ring buffer capacity in ticks (28 bytes each).
+TICK_BUFFER_ROWS = 1_000_000
+# Ticks are queried one window at a time, so neither side holds more than a window's result.
+TICK_QUERY_WINDOW = pd.Timedelta(days=1)
+# A broker silent for longer than this is taken to be closed; the silence counts neither as quoting time nor as a stale quote.
+TICK_SESSION_GAP = pd.Timedelta(minutes=30)
+TICK_COLUMNS = ['Spread_Median', 'Spread_P95', 'Quote_Rate', 'Stale_P95', 'Stale_Max']
+
+def iter_tick_chunks(records, brokers, chunk_rows=CHUNK_ROWS):
+    """
+    Groups streamed, pivoted Flux tick records (_time, broker, bid, ask) into TICK_DTYPE arrays of at
+    most `chunk_rows` rows. Records of unknown brokers or without both prices are dropped.
+    """
+    codes = {broker: code for code, broker in enumerate(brokers)}
+    buffer = []
+    for record in records:
+        values = record.values
+        buffer.append((values['_time'], codes.get(values['broker'], -1), values.get('bid'), values.get('ask')))
+        if len(buffer) >= chunk_rows:
+            yield _to_array(buffer)
+            buffer = []
+    if buffer:
+        yield _to_array(buffer)
+
+def _to_array(buffer):
+    times, codes, bids, asks = zip(*buffer)
+    chunk = np.empty(len(buffer), dtype=TICK_DTYPE)
+    chunk['time'] = pd.to_datetime(list(times), utc=True).as_unit('ns').asi8
+    chunk['broker'] = codes
+    chunk['bid'] = pd.to_numeric(pd.Series(bids, dtype=object), errors='coerce')
+    chunk['ask'] = pd.to_numeric(pd.Series(asks, dtype=object), errors='coerce')
+    return chunk[(chunk['broker'] >= 0) & ~np.isnan(chunk['bid']) & ~np.isnan(chunk['ask'])]
+
+class TickRingBuffer:
+    """
+    Fixed-size staging area for ticks, backed by a memory-mapped temporary file so its pages can be
+    written back to disk instead of growing the process. Writes wrap around to the start once the
+    filled rows have been drained, so memory stays the same however many ticks pass through.
+    """
+    def __init__(self, capacity=TICK_BUFFER_ROWS, directory=None):
+        if capacity < 1: raise ValueError("The tick buffer needs room for at least one tick.")
+        self._file = tempfile.TemporaryFile(dir=directory)
+        self.rows = np.memmap(self._file, dtype=TICK_DTYPE, mode='w+', shape=(capacity,))
+        self.size = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def full(self):
+        return self.size == len(self.rows)
+
+    def write(self, chunk):
+        """Copies as many rows of `chunk` as fit and returns how many were taken."""
+        taken = min(len(chunk), len(self.rows) - self.size)
+        self.rows[self.size:self.size + taken] = chunk[:taken]
+        self.size += taken
+        return taken
+
+    def drain(self):
+        """Returns the filled rows and rewinds; the view is only valid until the next write."""
+        filled, self.size = self.rows[:self.size], 0
+        return filled
+
+    def fold(self, chunks, accumulator):
+        """Stages the chunks, handing every full buffer to `accumulator`. Call drain() for the remainder."""
+        for chunk in chunks:
+            offset = 0
+            while offset < len(chunk):
+                offset += self.write(chunk[offset:])
+                if self.full:
+                    accumulator.update(self.drain())
+
+    def close(self):
+        del self.rows
+        self._file.close()
+
+class _BrokerTicks:
+    """Running state of one broker: the last tick, when its current quote started and the sketches."""
+    def __init__(self):
+        self.count = 0
+        self.last_time = self.quote_start = None
+        self.last_bid = self.last_ask = np.nan
+        self.active_ns = 0
+        self.spreads = QuantileSketch()
+        self.stale = QuantileSketch()
+        self.stale_max = 0.0
+
+class TickAccumulator:
+    """
+    Builds per-broker tick features from time-ordered tick blocks, keeping only a constant-size state
+    per broker:
+    - Spread_Median / Spread_P95: ask - bid (crossed quotes count as zero), from quantile sketches.
+    - Quote_Rate: quote updates per minute of quoting time (silences over TICK_SESSION_GAP excluded).
+    - Stale_P95 / Stale_Max: seconds a bid/ask pair stayed unchanged before the next change.
+    """
+    def __init__(self, brokers, session_gap=TICK_SESSION_GAP):
+        self.brokers = list(brokers)
+        self._gap_ns = session_gap.value
+        self._state = {}
+
+    def update(self, block):
+        if len(block) == 0: return
+        order = np.argsort(block['broker'], kind='stable')
+        codes = block['broker'][order]
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        for start, stop in zip(starts, np.r_[starts[1:], len(codes)]):
+            rows = order[start:stop]
+            self._update_broker(int(codes[start]), block['time'][rows], block['bid'][rows], block['ask'][rows])
+
+    def _update_broker(self, code, times, bids, asks):
+        state = self._state.setdefault(code, _BrokerTicks())
+        state.count += len(times)
+        state.spreads.update(np.maximum(asks - bids, 0.0))
+        if state.last_time is None:
+            state.last_time = state.quote_start = int(times[0])
+            state.last_bid, state.last_ask = bids[0], asks[0]
+
+        # Each tick is compared with the one before it, the first with the last tick of the previous block.
+        times, bids, asks = np.r_[state.last_time, times], np.r_[state.last_bid, bids], np.r_[state.last_ask, asks]
+        elapsed = np.diff(times)
+        closed = elapsed > self._gap_ns
+        state.active_ns += int(elapsed[~closed].sum())
+
+        # A new quote starts at every price change and after every silence; a quote cut by a silence ends at its last tick.
+        new_quote = np.flatnonzero((bids[1:] != bids[:-1]) | (asks[1:] != asks[:-1]) | closed) + 1
+        ends = np.where(closed[new_quote - 1], times[new_quote - 1], times[new_quote])
+        quote_starts = np.r_[state.quote_start, times[new_quote]]
+        self._add_stale(state, (ends - quote_starts[:-1]) / 1e9)
+
+        state.quote_start = int(quote_starts[-1])
+        state.last_time, state.last_bid, state.last_ask = int(times[-1]), bids[-1], asks[-1]
+
+    @staticmethod
+    def _add_stale(state, seconds):
+        if seconds.size:
+            state.stale.update(seconds)
+            state.stale_max = max(state.stale_max, float(seconds.max()))
+
+    def finalize(self, min_ticks):
+        """Returns the feature frame for every broker with at least `min_ticks` ticks."""
+        features_list = []
+        for code, state in sorted(self._state.items()):
+            if state.count < min_ticks: continue
+            # The quote still open at the end of the window is as old as it got.
+            self._add_stale(state, np.array([(state.last_time - state.quote_start) / 1e9]))
+            features_list.append({
+                'broker': self.brokers[code], 'Spread_Median': state.spreads.quantile(0.5), 'Spread_P95': state.spreads.quantile(0.95),
+                'Quote_Rate': state.count / (state.active_ns / 60e9) if state.active_ns else 0.0,
+                'Stale_P95': state.stale.quantile(0.95), 'Stale_Max': state.stale_max
+            })
+        if not features_list: raise ValueError("No broker had enough ticks.")
+        return pd.DataFrame(features_list).set_index('broker')
@@ -0,0 +1,31 @@
+# setup_rollups.py
+# Creates the downsampled OHLC rollup buckets and their InfluxDB tasks, optionally backfilling history.
+
+import os
+import sys
+import logging
+import argparse
+from dotenv import load_dotenv
+from influxdb_client import InfluxDBClient
+
+from core.rollups import RESOLUTIONS, ensure_rollups
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Create Griffin's 1m/1h/1d OHLC rollup buckets and downsampling tasks.")
+    parser.add_argument("--resolutions", nargs="+", choices=RESOLUTIONS, default=RESOLUTIONS)
+    parser.add_argument("--backfill-days", type=int, help="Also fill the rollups once from this many days of raw data.")
+    return parser.parse_args()
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    load_dotenv()
+    args = parse_args()
+
+    org, bucket = os.getenv("INFLUX_ORG", ""), os.getenv("INFLUX_BUCKET", "")
+    with InfluxDBClient(url=os.getenv("INFLUX_URL", ""), token=os.getenv("INFLUX_TOKEN", ""), org=org) as client:
+        ensure_rollups(client, bucket, org, args.resolutions, args.backfill_days)
+    logging.info(f"Rollups ready for {bucket}: {', '.join(args.resolutions)}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,56 @@
+# tests/test_features.py
+# Regression test: the vectorized OHLC features against the original per-broker loop.
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.candle_store import CandleStore
+from core.pipeline import AnalysisPipeline
+from benchmarks.synthetic import generate_candles
+
+MIN_POINTS = 50
+
+def reference_features(df, min_points):
+    """The original _extract_ohlc_features: one masked, sorted copy per broker."""
+    features_list = []
+    for broker in df['broker'].unique():
+        broker_df = df[df['broker'] == broker].copy().sort_values('_time')
+        if len(broker_df) < min_points: continue
+        gap = np.abs(broker_df['open'] - broker_df['close'].shift(1))
+        spike_ratio = (broker_df['high'] - broker_df['low']) / (np.abs(broker_df['open'] - broker_df['close']) + 1e-9)
+        features_list.append({
+            'broker': broker, 'Gap_Median': gap.median(), 'Spike_Median': spike_ratio.median(),
+            'Spike_Max': spike_ratio.max(), 'Gap_Max': gap.max()
+        })
+    return pd.DataFrame(features_list).set_index('broker')
+
+@pytest.fixture
+def uneven_candles():
+    """Shuffled candles of 8 brokers with different history lengths, random holes and one broker below MIN_POINTS."""
+    rng = np.random.default_rng(7)
+    df = generate_candles(brokers=8, candles=400, seed=7)
+    position = df.groupby('broker').cumcount()
+    first = df['broker'].map({f"Broker{i:04d}": start for i, start in enumerate(rng.integers(0, 300, 8))})
+    short = (df['broker'] == 'Broker0007') & (position < 400 - MIN_POINTS // 2)
+    df = df[(position >= first) & (rng.random(len(df)) > 0.1) & ~short]
+    return df.sample(frac=1, random_state=7).reset_index(drop=True)
+
+def test_candle_store_features_match_per_broker_loop(uneven_candles):
+    brokers = sorted(uneven_candles['broker'].unique())
+    features = CandleStore.from_frames([uneven_candles], brokers).features(MIN_POINTS)
+    expected = reference_features(uneven_candles, MIN_POINTS)
+
+    assert 'Broker0007' not in features.index
+    assert set(features.index) == set(expected.index)
+    pd.testing.assert_frame_equal(features, expected.loc[features.index], check_exact=False, rtol=1e-12)
+
+def test_pipeline_features_from_chunks_match_per_broker_loop(uneven_candles):
+    brokers = sorted(uneven_candles['broker'].unique())
+    chunks = [uneven_candles.iloc[i:i + 500] for i in range(0, len(uneven_candles), 500)]
+    pipeline = AnalysisPipeline()
+    pipeline.settings = {'min_points': MIN_POINTS}
+    features = pipeline._extract_ohlc_features(CandleStore.from_frames(chunks, brokers))
+    expected = reference_features(uneven_candles, MIN_POINTS)
+
+    pd.testing.assert_frame_equal(features, expected.loc[features.index], check_exact=False, rtol=1e-12)
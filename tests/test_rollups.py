@@ -0,0 +1,24 @@
+# tests/test_rollups.py
+# Resolution choice against the number of bars it actually yields.
+
+import pytest
+
+from core.rollups import choose_resolution
+
+@pytest.mark.parametrize('period', ['H2', 'H4', 'H6', 'H8', 'H12'])
+def test_sub_bar_resolution_counts_as_native_bars(period):
+    # 30 days of H4 give ~128 trading bars; daily candles would give ~21.
+    assert choose_resolution(30, 50, period) == '1h'
+
+def test_weekends_are_discounted():
+    # 300 calendar days are ~214 trading days, short of 240 daily bars.
+    assert choose_resolution(300, 240, 'H1') == '1h'
+    assert choose_resolution(400, 240, 'H1') == '1d'
+
+def test_unknown_period_uses_resolution_length():
+    assert choose_resolution(7, 50) == '1h'
+    assert choose_resolution(1, 500) == '1m'
+
+def test_falls_back_to_coarsest_resolution_with_most_bars():
+    assert choose_resolution(30, 10_000, 'D1') == '1d'
+    assert choose_resolution(1, 10_000, 'H4') == '1h'
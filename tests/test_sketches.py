@@ -0,0 +1,101 @@
+# tests/test_sketches.py
+# Error bounds of the quantile sketch and the incremental feature stores against exact computation.
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.sketches import QuantileSketch
+from core.feature_store import BrokerFeatureState, IncrementalFeatureStore, WindowedFeatureStore, FEATURE_COLUMNS
+from core.candle_store import CandleStore
+from benchmarks.synthetic import generate_candles
+
+ACCURACY = 0.01
+
+def assert_within_accuracy(estimate, exact, accuracy=ACCURACY):
+    assert abs(estimate - exact) <= accuracy * abs(exact)
+
+@pytest.mark.parametrize('q', [0.1, 0.5, 0.9, 0.99])
+def test_sketch_quantiles_within_relative_accuracy(q):
+    values = np.random.default_rng(1).lognormal(-8, 2, 100_000)
+    sketch = QuantileSketch(ACCURACY)
+    for chunk in np.array_split(values, 7):
+        sketch.update(chunk)
+    assert_within_accuracy(sketch.quantile(q), np.quantile(values, q))
+
+def test_merged_sketch_equals_single_pass():
+    values = np.random.default_rng(2).lognormal(0, 1, 50_000)
+    values[::100] = 0.0
+    single, first, second = QuantileSketch(ACCURACY), QuantileSketch(ACCURACY), QuantileSketch(ACCURACY)
+    single.update(values)
+    first.update(values[:20_000])
+    second.update(values[20_000:])
+    first.merge(second)
+
+    assert first.count == single.count and first.zero_count == single.zero_count
+    for q in [0.05, 0.5, 0.95]:
+        assert first.quantile(q) == single.quantile(q)
+        assert_within_accuracy(first.quantile(q), np.quantile(values, q))
+
+@pytest.fixture
+def candles():
+    df = generate_candles(brokers=6, candles=2_000, seed=3)
+    return df, sorted(df['broker'].unique())
+
+def test_incremental_store_within_accuracy_of_exact_features(candles):
+    df, brokers = candles
+    store = IncrementalFeatureStore(ACCURACY)
+    df = df.sort_values('_time')
+    for offset in range(0, len(df), 1_500):
+        store.update(df.iloc[offset:offset + 1_500], 'EURUSD', 'H1')
+    features = store.features(brokers, 'EURUSD', 'H1', 100)
+    exact = CandleStore.from_frames([df], brokers).features(100)[FEATURE_COLUMNS]
+
+    pd.testing.assert_index_equal(features.index, exact.index)
+    for column in ['Gap_Median', 'Spike_Median']:
+        for broker in brokers:
+            assert_within_accuracy(features.at[broker, column], exact.at[broker, column])
+    pd.testing.assert_frame_equal(features[['Spike_Max', 'Gap_Max']], exact[['Spike_Max', 'Gap_Max']], check_exact=True)
+
+def test_merged_feature_states_within_accuracy_of_exact_features(candles):
+    df, _ = candles
+    series = df[df['broker'] == 'Broker0002'].sort_values('_time')
+    arrays = [series['_time'].to_numpy(dtype='datetime64[ns]')] + [series[col].to_numpy() for col in ['open', 'high', 'low', 'close']]
+    split = 1_234
+    first, second = BrokerFeatureState(ACCURACY), BrokerFeatureState(ACCURACY)
+    for offset in range(0, split, 300):
+        first.update(*(a[offset:min(offset + 300, split)] for a in arrays))
+    second.update(*(a[split:] for a in arrays))
+    first.merge(second)
+    merged = first.features()
+
+    # Each partial state only sees the gaps inside its own stretch; the gap across the split is unobservable.
+    opens, highs, lows, closes = arrays[1:]
+    gaps = np.abs(opens[1:] - closes[:-1])
+    gaps = np.delete(gaps, split - 1)
+    spikes = (highs - lows) / (np.abs(opens - closes) + 1e-9)
+    assert first.points == len(series)
+    assert_within_accuracy(merged['Gap_Median'], np.median(gaps))
+    assert_within_accuracy(merged['Spike_Median'], np.median(spikes))
+    assert merged['Gap_Max'] == gaps.max()
+    assert merged['Spike_Max'] == spikes.max()
+
+def test_windowed_store_drops_expired_days(candles):
+    df, brokers = candles
+    df = df.sort_values('_time')
+    windowed, single = WindowedFeatureStore(relative_accuracy=ACCURACY), IncrementalFeatureStore(ACCURACY)
+    for offset in range(0, len(df), 1_500):
+        windowed.update(df.iloc[offset:offset + 1_500], 'EURUSD', 'H1')
+    single.update(df, 'EURUSD', 'H1')
+    # The day buckets chain their gaps, so before anything expires they merge to the single-pass features.
+    pd.testing.assert_frame_equal(windowed.features(brokers, 'EURUSD', 'H1', 100), single.features(brokers, 'EURUSD', 'H1', 100))
+
+    since = df['_time'].max() - pd.Timedelta(days=20)
+    windowed.expire(since)
+    kept = df[df['_time'] >= since.floor('D')]
+    features = windowed.features(brokers, 'EURUSD', 'H1', 100)
+    exact = CandleStore.from_frames([kept], brokers).features(100)[FEATURE_COLUMNS]
+    for broker in brokers:
+        assert windowed.state(broker, 'EURUSD', 'H1').points == (kept['broker'] == broker).sum()
+        assert_within_accuracy(features.at[broker, 'Spike_Median'], exact.at[broker, 'Spike_Median'])
+    pd.testing.assert_series_equal(features['Spike_Max'], exact['Spike_Max'])
@@ -4,6 +4,7 @@
 import os
 import logging
 import warnings
+import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
 import pyqtgraph as pg
@@ -11,13 +12,17 @@ from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QLineEdit, QLabel, QGroupBox, QTabWidget, QTableView,
     QListWidget, QComboBox, QSpinBox, QProgressBar, QStatusBar, QMessageBox,
-    QListWidgetItem
+    QListWidgetItem, QCheckBox, QFileDialog, QAbstractItemView
 )
-from PyQt6.QtCore import QThreadPool, pyqtSlot, Qt
+from PyQt6.QtCore import QThreadPool, QTimer, pyqtSlot, pyqtSignal, Qt
 
-from core.analysis_engine import AnalysisEngine
+from ui.startup import StartupLoader
 from utils.worker import Worker
 from utils.pandas_model import PandasModel
+from core.profiling import PROFILE_COLUMNS, write_profile_jsonl
+from core.rollups import RESOLUTIONS
+from core.ticks import TICK_MEASUREMENT
+from core.result_store import ResultStore, DEFAULT_RESULT_STORE_PATH
 
 # --- Basic Configuration ---
 warnings.simplefilter("ignore")
@@ -25,18 +30,36 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 load_dotenv()
 pg.setConfigOption('background', '#2E3440')
 pg.setConfigOption('foreground', '#D8DEE9')
+LABEL_LIMIT = 50 # Broker labels are drawn only when at most this many points are in view
+HOVER_RADIUS_PX = 8
 
 class MainWindow(QMainWindow):
+    engine_ready = pyqtSignal()
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Griffin - Intelligent Broker Analyzer v1.6")
         self.setGeometry(100, 100, 1200, 700)
         self.thread_pool = QThreadPool()
-        self.analysis_engine = AnalysisEngine()
+        self.analysis_engine = None # Created once the StartupLoader has imported the analysis stack
         self.symbol_map = {} # To store the normalized symbol data
+        self.candles = None # CandleStore of the last client-side analysis; shown as a frame only on demand
+        self.scatter = None # Single scatter item holding every broker
+        self.profile_brushes = {} # Profile name -> brush
+        self.label_items = {} # Broker -> label item, created on first zoom-in
+        self.plot_positions = None # PC1/PC2 of the points currently drawn
+        self.plot_profiles = None # Profile of each drawn point, in plot_brokers order
+        self.profile_history = pd.DataFrame(columns=PROFILE_COLUMNS) # Stage timings of every run this session
+        self.point_index = None # KD-tree over the drawn points in screen pixels, for hover lookup
+        self.point_index_scale = None # Data units per pixel the index was built with
+        self.result_store = ResultStore(os.getenv("GRIFFIN_RESULT_STORE", DEFAULT_RESULT_STORE_PATH))
+        self.live_busy = False
+        self.live_timer = QTimer(self)
         self.init_ui()
         self.apply_stylesheet()
         self.load_settings()
+        self.refresh_history()
+        self.load_engine()
 
     def init_ui(self):
         """Initializes all UI components."""
@@ -66,6 +89,15 @@ class MainWindow(QMainWindow):
         db_layout.addWidget(self.db_org)
         db_layout.addWidget(QLabel("Bucket:"))
         db_layout.addWidget(self.db_bucket)
+        self.data_path = QLineEdit()
+        self.data_path.setPlaceholderText("Optional: read candles from files instead")
+        self.data_path.setToolTip("A Parquet, Arrow/Feather or CSV file or folder (e.g. broker=X/symbol=Y/period=H1/ partitions).")
+        self.browse_data_button = QPushButton("Browse...")
+        data_path_layout = QHBoxLayout()
+        data_path_layout.addWidget(self.data_path)
+        data_path_layout.addWidget(self.browse_data_button)
+        db_layout.addWidget(QLabel("Data Files:"))
+        db_layout.addLayout(data_path_layout)
         db_layout.addWidget(self.fetch_button)
         db_group.setLayout(db_layout)
 
@@ -77,12 +109,51 @@ class MainWindow(QMainWindow):
         self.min_points_spin = QSpinBox()
         self.min_points_spin.setRange(50, 1000)
         self.min_points_spin.setValue(240)
+        self.lookback_spin = QSpinBox()
+        self.lookback_spin.setRange(1, 3650)
+        self.lookback_spin.setValue(30)
+        self.lookback_spin.setSuffix(" days")
+        self.resolution_combo = QComboBox()
+        self.resolution_combo.addItem("Auto (coarsest that meets the minimum)", "auto")
+        for resolution in RESOLUTIONS:
+            self.resolution_combo.addItem(resolution, resolution)
+        self.processing_combo = QComboBox()
+        self.processing_combo.addItem("Client-side", "client")
+        self.processing_combo.addItem("Streaming (low memory)", "streaming")
+        self.processing_combo.addItem("Streaming (sketch, constant memory)", "sketch")
+        self.processing_combo.addItem("Server-side (Flux)", "server")
+        self.use_cache_check = QCheckBox("Use local data cache")
+        self.use_cache_check.setChecked(True)
+        self.profile_memory_check = QCheckBox("Trace peak memory per stage (slower)")
+        self.reuse_results_check = QCheckBox("Reuse stored results of identical analyses")
+        self.reuse_results_check.setChecked(True)
+        self.use_rollups_check = QCheckBox("Read rollup buckets (see setup_rollups.py)")
+        self.use_rollups_check.setToolTip("Reads pre-aggregated OHLC buckets instead of downsampling raw data at query time.")
+        self.consensus_check = QCheckBox("Cross-broker consensus features")
+        self.consensus_check.setToolTip("Adds each broker's deviation from, lag behind and missing bars against the median of all brokers (client-side mode).")
+        self.tick_features_check = QCheckBox("Tick spread and quote-stability features")
+        self.tick_features_check.setToolTip("Adds spread percentiles, quote update rate and stale-quote durations from the bid/ask tick measurement (InfluxDB only).")
+        self.float32_check = QCheckBox("Compact prices (float32)")
+        self.float32_check.setToolTip("Halves the memory of the candle prices. Spike ratios of near-doji candles lose precision.")
         analysis_layout.addWidget(QLabel("Symbol:"))
         analysis_layout.addWidget(self.symbol_combo)
         analysis_layout.addWidget(QLabel("Timeframe:"))
         analysis_layout.addWidget(self.timeframe_combo)
         analysis_layout.addWidget(QLabel("Minimum Data Points:"))
         analysis_layout.addWidget(self.min_points_spin)
+        analysis_layout.addWidget(QLabel("Lookback:"))
+        analysis_layout.addWidget(self.lookback_spin)
+        analysis_layout.addWidget(QLabel("Resolution:"))
+        analysis_layout.addWidget(self.resolution_combo)
+        analysis_layout.addWidget(QLabel("Processing Mode:"))
+        analysis_layout.addWidget(self.processing_combo)
+        analysis_layout.addWidget(self.use_cache_check)
+        analysis_layout.addWidget(self.use_rollups_check)
+        analysis_layout.addWidget(self.consensus_check)
+        analysis_layout.addWidget(self.tick_features_check)
+        analysis_layout.addWidget(self.float32_check)
+        analysis_layout.addWidget(self.profile_memory_check)
+        analysis_layout.addWidget(self.reuse_results_check)
         self.analysis_group.setLayout(analysis_layout)
 
         # Broker List
@@ -100,11 +171,23 @@ class MainWindow(QMainWindow):
 
         # Control Button
         self.start_button = QPushButton("Start Analysis")
+
+        # Live Monitoring
+        live_layout = QHBoxLayout()
+        self.live_button = QPushButton("Start Live Monitoring")
+        self.live_button.setCheckable(True)
+        self.live_interval_spin = QSpinBox()
+        self.live_interval_spin.setRange(1, 60)
+        self.live_interval_spin.setValue(5)
+        self.live_interval_spin.setSuffix(" min")
+        live_layout.addWidget(self.live_button)
+        live_layout.addWidget(self.live_interval_spin)
         
         left_layout.addWidget(db_group)
         left_layout.addWidget(self.analysis_group)
         left_layout.addWidget(self.broker_group)
         left_layout.addWidget(self.start_button)
+        left_layout.addLayout(live_layout)
         
         # --- Right Panel: Output ---
         right_panel = QWidget()
@@ -112,8 +195,14 @@ class MainWindow(QMainWindow):
         self.tabs = QTabWidget()
         self.plot_tab = QWidget()
         self.report_tab = QWidget()
+        self.candle_tab = QWidget()
+        self.performance_tab = QWidget()
+        self.history_tab = QWidget()
         self.tabs.addTab(self.plot_tab, "Cluster Plot")
         self.tabs.addTab(self.report_tab, "Detailed Report")
+        self.tabs.addTab(self.candle_tab, "Candle Data")
+        self.tabs.addTab(self.performance_tab, "Performance")
+        self.tabs.addTab(self.history_tab, "History")
         
         self.plot_layout = QVBoxLayout(self.plot_tab)
         self.plot_widget = pg.PlotWidget()
@@ -122,11 +211,45 @@ class MainWindow(QMainWindow):
         self.hover_text = pg.TextItem("", anchor=(0, 1), color='#FFFFFF', fill=pg.mkBrush(0,0,0,150))
         self.plot_widget.addItem(self.hover_text)
         self.plot_widget.scene().sigMouseMoved.connect(self.on_mouse_hover)
+        self.plot_widget.getViewBox().sigRangeChanged.connect(self.update_labels)
 
         self.report_layout = QVBoxLayout(self.report_tab)
         self.report_table = QTableView()
+        self.report_table.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+        self.report_table.setSortingEnabled(True)
+        self.report_table.setToolTip("Double-click a broker to view its candles.")
         self.report_layout.addWidget(self.report_table)
 
+        self.candle_layout = QVBoxLayout(self.candle_tab)
+        self.candle_table = QTableView()
+        self.candle_table.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+        self.candle_table.setSortingEnabled(True)
+        self.candle_layout.addWidget(self.candle_table)
+
+        self.performance_layout = QVBoxLayout(self.performance_tab)
+        self.performance_table = QTableView()
+        self.performance_table.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+        self.performance_table.setSortingEnabled(True)
+        self.export_profile_button = QPushButton("Export as JSON Lines...")
+        self.export_profile_button.setEnabled(False)
+        self.performance_layout.addWidget(self.performance_table)
+        self.performance_layout.addWidget(self.export_profile_button)
+
+        self.history_layout = QVBoxLayout(self.history_tab)
+        self.history_table = QTableView()
+        self.history_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.history_table.setToolTip("Double-click a run to reopen it; select several to compare their profiles.")
+        history_button_layout = QHBoxLayout()
+        self.refresh_history_button = QPushButton("Refresh")
+        self.compare_runs_button = QPushButton("Compare Selected")
+        history_button_layout.addWidget(self.refresh_history_button)
+        history_button_layout.addWidget(self.compare_runs_button)
+        self.comparison_table = QTableView()
+        self.comparison_table.setSortingEnabled(True)
+        self.history_layout.addWidget(self.history_table)
+        self.history_layout.addLayout(history_button_layout)
+        self.history_layout.addWidget(self.comparison_table)
+
         right_layout.addWidget(self.tabs)
 
         # --- Status Bar ---
@@ -141,55 +264,172 @@ class MainWindow(QMainWindow):
         # --- Initial State & Connections ---
         self.set_analysis_controls_enabled(False)
         self.fetch_button.clicked.connect(self.fetch_metadata)
+        self.browse_data_button.clicked.connect(self.browse_data_path)
         self.start_button.clicked.connect(self.run_analysis)
+        self.live_button.toggled.connect(self.toggle_live_monitoring)
+        self.live_timer.timeout.connect(self.refresh_live_monitoring)
         self.select_all_btn.clicked.connect(self.select_all_brokers)
         self.deselect_all_btn.clicked.connect(self.deselect_all_brokers)
+        self.report_table.doubleClicked.connect(self.show_broker_candles)
+        self.tabs.currentChanged.connect(self.on_tab_changed)
+        self.export_profile_button.clicked.connect(self.export_profile)
+        self.history_table.doubleClicked.connect(self.open_stored_run)
+        self.refresh_history_button.clicked.connect(self.refresh_history)
+        self.compare_runs_button.clicked.connect(self.compare_stored_runs)
+
+    def load_engine(self):
+        """Imports the ML and DB stacks in the background; the window stays usable meanwhile."""
+        self.fetch_button.setEnabled(False)
+        self.status_bar.showMessage("Loading analysis engine...")
+        self.startup_loader = StartupLoader()
+        self.startup_loader.loaded.connect(self.on_engine_loaded)
+        self.startup_loader.failed.connect(self.show_error)
+        self.thread_pool.start(Worker(self.startup_loader.load))
+
+    @pyqtSlot(dict)
+    def on_engine_loaded(self, timings):
+        from core.analysis_engine import AnalysisEngine
+        self.analysis_engine = AnalysisEngine()
+        self.analysis_engine.compute_pool.warm_up()
         self.analysis_engine.finished.connect(self.on_analysis_finished)
+        self.analysis_engine.data_loaded.connect(self.on_data_loaded)
         self.analysis_engine.progress.connect(self.update_progress)
         self.analysis_engine.error.connect(self.show_error)
         self.analysis_engine.metadata_found.connect(self.on_metadata_found)
+        self.analysis_engine.live_updated.connect(self.on_live_updated)
+        self.analysis_engine.live_idle.connect(self.on_live_idle)
+        self.analysis_engine.cancelled.connect(self.on_run_cancelled)
+        self.analysis_engine.profile_ready.connect(self.on_profile_ready)
+        self.fetch_button.setEnabled(True)
+        self.status_bar.showMessage(f"Analysis engine loaded in {sum(timings.values()):.1f}s.", 5000)
+        self.engine_ready.emit()
 
     def set_analysis_controls_enabled(self, enabled):
         self.analysis_group.setEnabled(enabled)
         self.broker_group.setEnabled(enabled)
         self.start_button.setEnabled(enabled)
+        self.live_button.setEnabled(enabled)
 
     def load_settings(self):
         self.db_url.setText(os.getenv("INFLUX_URL", ""))
         self.db_token.setText(os.getenv("INFLUX_TOKEN", ""))
         self.db_org.setText(os.getenv("INFLUX_ORG", ""))
         self.db_bucket.setText(os.getenv("INFLUX_BUCKET", ""))
+        self.data_path.setText(os.getenv("GRIFFIN_DATA_PATH", ""))
+
+    def browse_data_path(self):
+        path = QFileDialog.getExistingDirectory(self, "Select Candle Data Folder", self.data_path.text())
+        if path:
+            self.data_path.setText(path)
 
     def fetch_metadata(self):
         self.fetch_button.setEnabled(False)
         self.set_analysis_controls_enabled(False)
         self.status_bar.showMessage("Fetching metadata from database...")
         self.progress_bar.setValue(0)
-        settings = {"url": self.db_url.text(), "token": self.db_token.text(), "org": self.db_org.text(), "bucket": self.db_bucket.text()}
+        settings = {"url": self.db_url.text(), "token": self.db_token.text(), "org": self.db_org.text(), "bucket": self.db_bucket.text(),
+                    "data_path": self.data_path.text().strip() or None}
+        if os.getenv("GRIFFIN_SYMBOL_SUFFIXES"):
+            settings["symbol_suffixes"] = [s.strip() for s in os.getenv("GRIFFIN_SYMBOL_SUFFIXES").split(",") if s.strip()]
         worker = Worker(self.analysis_engine.fetch_metadata, settings)
         self.thread_pool.start(worker)
 
     def run_analysis(self):
-        self.start_button.setEnabled(False)
+        # The start button stays enabled: clicking again with new settings supersedes the running analysis.
+        settings = self.collect_settings()
+        if settings is None:
+            return
+        token = self.analysis_engine.request_run(settings)
+        if token is None:
+            self.status_bar.showMessage("An analysis with these settings is already running.", 5000)
+            return
+
         self.fetch_button.setEnabled(False)
         self.status_bar.showMessage("Starting analysis...")
         self.progress_bar.setValue(0)
-        
+        self.candles = None
+        self.candle_table.setModel(None)
+        worker = Worker(self.analysis_engine.run_analysis, settings, token)
+        self.thread_pool.start(worker)
+
+    def collect_settings(self):
+        """Builds the analysis settings from the controls, or returns None if no broker is selected."""
         selected_brokers = [self.broker_list_widget.item(i).text() for i in range(self.broker_list_widget.count()) if self.broker_list_widget.item(i).checkState() == Qt.CheckState.Checked]
         if not selected_brokers:
             self.show_error("Please select at least one broker.")
-            return
+            return None
 
-        settings = {
+        return {
             "url": self.db_url.text(), "token": self.db_token.text(), "org": self.db_org.text(),
-            "bucket": self.db_bucket.text(), "brokers": selected_brokers,
+            "bucket": self.db_bucket.text(), "data_path": self.data_path.text().strip() or None, "brokers": selected_brokers,
+            "broker_universe": [self.broker_list_widget.item(i).text() for i in range(self.broker_list_widget.count())],
             "base_symbol": self.symbol_combo.currentText(), # Pass the base symbol
             "symbol_map": self.symbol_map, # Pass the full map
             "timeframe": self.timeframe_combo.currentText(),
-            "min_points": self.min_points_spin.value(), "min_brokers": 2
+            "min_points": self.min_points_spin.value(), "min_brokers": 2,
+            "lookback_days": self.lookback_spin.value(), "resolution": self.resolution_combo.currentData(),
+            "use_rollups": self.use_rollups_check.isChecked(),
+            "processing_mode": self.processing_combo.currentData(), "consensus_features": self.consensus_check.isChecked(),
+            "tick_features": self.tick_features_check.isChecked(), "tick_measurement": os.getenv("GRIFFIN_TICK_MEASUREMENT", TICK_MEASUREMENT),
+            "use_cache": self.use_cache_check.isChecked(), "cache_dir": os.getenv("GRIFFIN_CACHE_DIR"),
+            "price_dtype": "float32" if self.float32_check.isChecked() else "float64",
+            "profile_log": os.getenv("GRIFFIN_PROFILE_LOG"), "profile_memory": self.profile_memory_check.isChecked(),
+            "result_store": self.result_store.path, "reuse_results": self.reuse_results_check.isChecked()
         }
-        worker = Worker(self.analysis_engine.run_analysis, settings)
-        self.thread_pool.start(worker)
+
+    def toggle_live_monitoring(self, checked):
+        if not checked:
+            self.live_timer.stop()
+            self.analysis_engine.cancel_run()
+            self.live_busy = False
+            self.live_button.setText("Start Live Monitoring")
+            self.analysis_group.setEnabled(True)
+            self.broker_group.setEnabled(True)
+            self.start_button.setEnabled(True)
+            self.fetch_button.setEnabled(True)
+            self.status_bar.showMessage("Live monitoring stopped.", 5000)
+            return
+
+        settings = self.collect_settings()
+        if settings is None:
+            self.live_button.setChecked(False)
+            return
+        self.live_button.setText("Stop Live Monitoring")
+        self.analysis_group.setEnabled(False)
+        self.broker_group.setEnabled(False)
+        self.start_button.setEnabled(False)
+        self.fetch_button.setEnabled(False)
+        self.progress_bar.setValue(0)
+        self.live_busy = True
+        self.thread_pool.start(Worker(self.analysis_engine.start_live_monitoring, settings, self.analysis_engine.request_run()))
+        self.live_timer.start(self.live_interval_spin.value() * 60_000)
+
+    def refresh_live_monitoring(self):
+        # Skip a tick rather than queueing refreshes behind a slow one.
+        if self.live_busy:
+            return
+        self.live_busy = True
+        self.thread_pool.start(Worker(self.analysis_engine.refresh_live_monitoring, self.analysis_engine.request_run()))
+
+    @pyqtSlot(pd.DataFrame, pd.DataFrame, bool)
+    def on_live_updated(self, report_df, pca_df, reclustered):
+        self.live_busy = False
+        if not self.live_button.isChecked():
+            return
+        if reclustered or not self.update_plot_points(pca_df):
+            self.draw_plot(pca_df)
+        self.report_table.setModel(PandasModel(report_df.reset_index().round(4)))
+        state = "reclustered" if reclustered else "features updated"
+        self.status_bar.showMessage(f"Live: {state} at {pd.Timestamp.now():%H:%M:%S}.")
+
+    @pyqtSlot()
+    def on_live_idle(self):
+        self.live_busy = False
+
+    @pyqtSlot()
+    def on_run_cancelled(self):
+        # The run that superseded this one, if any, reports its own outcome.
+        self.live_busy = False
 
     def select_all_brokers(self):
         for i in range(self.broker_list_widget.count()):
@@ -231,15 +471,98 @@ class MainWindow(QMainWindow):
         self.start_button.setEnabled(True)
         self.fetch_button.setEnabled(True)
         self.status_bar.showMessage("Analysis finished successfully.", 5000)
+        self.show_results(report_df, pca_df)
+        self.refresh_history()
+
+    def show_results(self, report_df, pca_df):
         self.draw_plot(pca_df)
         model = PandasModel(report_df.reset_index().round(4))
         self.report_table.setModel(model)
         self.report_table.resizeColumnsToContents()
         self.tabs.setCurrentWidget(self.plot_tab)
+
+    def refresh_history(self):
+        self.history_table.setModel(PandasModel(self.result_store.history()))
+        self.history_table.resizeColumnsToContents()
+
+    def selected_run_ids(self):
+        model = self.history_table.model()
+        if model is None:
+            return []
+        return [int(model.row_data(index.row())['run_id']) for index in self.history_table.selectionModel().selectedRows()]
+
+    def open_stored_run(self, index):
+        """Shows a stored analysis without recomputing it."""
+        run_id = int(self.history_table.model().row_data(index.row())['run_id'])
+        try:
+            report_df, pca_df = self.result_store.load(run_id)
+        except Exception as e:
+            self.show_error(f"Could not open stored analysis {run_id}: {e}")
+            return
+        self.candles = None
+        self.candle_table.setModel(None)
+        self.show_results(report_df, pca_df)
+        self.status_bar.showMessage(f"Opened stored analysis {run_id}.", 5000)
+
+    def compare_stored_runs(self):
+        """Lines up the profile each selected run assigned to every broker."""
+        run_ids = self.selected_run_ids()
+        if len(run_ids) < 2:
+            self.status_bar.showMessage("Select at least two runs to compare.", 5000)
+            return
+        comparison = self.result_store.assignments(sorted(run_ids))
+        self.comparison_table.setModel(PandasModel(comparison.rename_axis('broker').reset_index().fillna('-')))
+        self.comparison_table.resizeColumnsToContents()
+
+    @pyqtSlot(object)
+    def on_data_loaded(self, candles):
+        # The full candle frame is a second copy of every candle, so it is only built once the tab is opened.
+        self.candles = candles
+        if self.tabs.currentWidget() is self.candle_tab:
+            self.show_candles()
+
+    def on_tab_changed(self, index):
+        if self.tabs.widget(index) is self.candle_tab and self.candle_table.model() is None and self.candles is not None:
+            self.show_candles()
+
+    def show_candles(self, brokers=None):
+        self.candle_table.setModel(PandasModel(self.candles.frame(brokers)))
+        self.candle_table.resizeColumnsToContents()
+
+    @pyqtSlot(pd.DataFrame)
+    def on_profile_ready(self, profile_df):
+        """Appends the stage timings of the finished run to the session's performance history."""
+        self.profile_history = pd.concat([self.profile_history, profile_df], ignore_index=True)
+        self.performance_table.setModel(PandasModel(self.profile_history.round(4)))
+        self.performance_table.resizeColumnsToContents()
+        self.export_profile_button.setEnabled(True)
+
+    def export_profile(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Performance Profile", "griffin_profile.jsonl", "JSON Lines (*.jsonl)")
+        if not path:
+            return
+        try:
+            write_profile_jsonl(self.profile_history, path)
+            self.status_bar.showMessage(f"Exported {len(self.profile_history)} stage records to {path}.", 5000)
+        except OSError as e:
+            self.show_error(f"Could not export the profile: {e}")
+
+    def show_broker_candles(self, index):
+        """Drills down from a report row to that broker's raw candles."""
+        if self.candles is None:
+            self.status_bar.showMessage("Candle data is only kept for client-side analyses.", 5000)
+            return
+        broker = self.report_table.model().row_data(index.row())['broker']
+        if broker not in self.candles.brokers:
+            self.status_bar.showMessage(f"No candles were loaded for {broker}.", 5000)
+            return
+        self.show_candles([broker])
+        self.tabs.setCurrentWidget(self.candle_tab)
     
     def draw_plot(self, pca_df):
         try:
             self.plot_widget.clear()
+            self.plot_widget.addItem(self.hover_text)
             variance = pca_df.attrs.get('explained_variance', [0, 0])
             self.plot_widget.setTitle("Broker Clustering Map", size="12pt")
             self.plot_widget.setLabel('left', f"Principal Component 2 ({variance[1]:.1%} variance)")
@@ -247,47 +570,130 @@ class MainWindow(QMainWindow):
             self.plot_widget.showGrid(x=True, y=True)
             
             legend = self.plot_widget.addLegend()
+            legend.clear()
             colors = pg.colormap.get('viridis').getColors(mode='qcolor')
-            
-            for i, profile_name in enumerate(pca_df['Profile'].unique()):
-                color_index = int(i * (len(colors) - 1) / max(1, len(pca_df['Profile'].unique()) - 1))
-                color = colors[color_index]
-                cluster_data = pca_df[pca_df['Profile'] == profile_name]
-                
-                scatter = pg.ScatterPlotItem(
-                    size=10, pen=pg.mkPen(None), brush=pg.mkBrush(color), name=profile_name
-                )
-                spots = [{'pos': [row.PC1, row.PC2], 'data': row.Index} for row in cluster_data.itertuples()]
-                scatter.addPoints(spots)
-                self.plot_widget.addItem(scatter)
-                
-                for spot in spots:
-                    text = pg.TextItem(spot['data'], anchor=(0.5, 1.5), color='#D8DEE9')
-                    text.setPos(spot['pos'][0], spot['pos'][1])
-                    self.plot_widget.addItem(text)
+
+            # One scatter item for all brokers; the legend gets a detached sample item per profile.
+            profiles = pca_df['Profile'].unique()
+            self.profile_brushes = {}
+            for i, profile_name in enumerate(profiles):
+                color_index = int(i * (len(colors) - 1) / max(1, len(profiles) - 1))
+                self.profile_brushes[profile_name] = pg.mkBrush(colors[color_index])
+                legend.addItem(pg.ScatterPlotItem(size=10, pen=pg.mkPen(None), brush=self.profile_brushes[profile_name]), profile_name)
+
+            self.scatter = pg.ScatterPlotItem(size=10, pen=pg.mkPen(None))
+            self.plot_widget.addItem(self.scatter)
+            self.label_items = {}
+            self.set_plot_points(pca_df)
         except Exception as e:
             logging.error(f"Failed to draw plot: {e}", exc_info=True)
             self.show_error(f"An error occurred while drawing the plot: {e}")
 
+    def set_plot_points(self, pca_df):
+        """Pushes all coordinates and brushes to the scatter item in one call and rebuilds the hover index."""
+        self.plot_positions = pca_df[['PC1', 'PC2']].copy()
+        self.plot_xy = self.plot_positions.to_numpy(copy=True)
+        self.plot_brokers = pca_df.index.to_numpy()
+        self.plot_profiles = pca_df['Profile'].to_numpy()
+        brushes = [self.profile_brushes[profile] for profile in self.plot_profiles]
+        self.scatter.setData(x=self.plot_xy[:, 0], y=self.plot_xy[:, 1], brush=brushes, data=self.plot_brokers)
+        self.index_points()
+        for broker, label in self.label_items.items():
+            if broker in self.plot_positions.index:
+                label.setPos(*self.plot_positions.loc[broker])
+        self.update_labels()
+
+    def index_points(self):
+        """Indexes the points in pixel units of the current view, so nearest means nearest on screen."""
+        from scipy.spatial import cKDTree # Loaded by the StartupLoader, so this is only a lookup
+        self.point_index_scale = np.array(self.plot_widget.getViewBox().viewPixelSize())
+        self.point_index = cKDTree(self.plot_xy / self.point_index_scale)
+
+    def update_plot_points(self, pca_df):
+        """
+        Writes only the points whose coordinates or profile changed into the scatter item, keeping
+        every plot item. Returns False when the brokers or profiles differ and a full redraw is needed.
+        """
+        if (self.plot_positions is None or not set(pca_df['Profile'].unique()) <= set(self.profile_brushes)
+                or not pca_df.index.sort_values().equals(self.plot_positions.index.sort_values())):
+            return False
+        pca_df = pca_df.reindex(self.plot_brokers)
+        xy, profiles = pca_df[['PC1', 'PC2']].to_numpy(), pca_df['Profile'].to_numpy()
+        moved = np.flatnonzero((xy != self.plot_xy).any(axis=1))
+        restyled = np.flatnonzero(profiles != self.plot_profiles)
+        if moved.size == 0 and restyled.size == 0:
+            return True
+
+        # The scatter's point table has one row per broker in plot_brokers order; its cached symbol
+        # rects are cleared for the restyled rows so updateSpots() renders them again.
+        points = self.scatter.data
+        points['x'][moved], points['y'][moved] = xy[moved, 0], xy[moved, 1]
+        brushes = np.empty(restyled.size, dtype=object)
+        brushes[:] = [self.profile_brushes[profile] for profile in profiles[restyled]]
+        points['brush'][restyled] = brushes
+        points['sourceRect'][restyled] = (0, 0, 0, 0)
+        self.scatter.prepareGeometryChange()
+        self.scatter.informViewBoundsChanged()
+        self.scatter.bounds = [None, None]
+        self.scatter.updateSpots()
+        self.scatter.invalidate()
+        self.scatter.sigPlotChanged.emit(self.scatter)
+
+        self.plot_xy[moved], self.plot_profiles = xy[moved], profiles
+        self.plot_positions.iloc[moved] = xy[moved]
+        for broker, position in zip(self.plot_brokers[moved], xy[moved]):
+            if broker in self.label_items:
+                self.label_items[broker].setPos(*position)
+        if moved.size:
+            self.index_points()
+        self.update_labels()
+        return True
+
+    def update_labels(self):
+        """Shows broker labels only for the points in view, and only once few enough are visible."""
+        if self.point_index is None:
+            return
+        (x0, x1), (y0, y1) = self.plot_widget.getViewBox().viewRange()
+        x, y = self.plot_xy[:, 0], self.plot_xy[:, 1]
+        visible = np.flatnonzero((x >= x0) & (x <= x1) & (y >= y0) & (y <= y1))
+        shown = set(self.plot_brokers[visible]) if len(visible) <= LABEL_LIMIT else set()
+
+        for broker in shown:
+            label = self.label_items.get(broker)
+            if label is None:
+                label = pg.TextItem(broker, anchor=(0.5, 1.5), color='#D8DEE9')
+                label.setPos(*self.plot_positions.loc[broker])
+                self.plot_widget.addItem(label)
+                self.label_items[broker] = label
+            label.setVisible(True)
+        for broker, label in self.label_items.items():
+            if broker not in shown:
+                label.setVisible(False)
+
     def on_mouse_hover(self, pos):
         try:
-            point = self.plot_widget.getViewBox().mapSceneToView(pos)
-            items = self.plot_widget.scene().items(pos)
-            scatter_items = [item for item in items if isinstance(item, pg.ScatterPlotItem)]
-            
-            if scatter_items:
-                points_at_pos = scatter_items[0].pointsAt(point)
-                if len(points_at_pos) > 0:
-                    broker_name = points_at_pos[0].data()
-                    self.hover_text.setText(f"Broker: {broker_name}")
-                    self.hover_text.setPos(point)
-                    return
+            if self.point_index is None or len(self.plot_brokers) == 0:
+                return
+            view_box = self.plot_widget.getViewBox()
+            point = view_box.mapSceneToView(pos)
+            # Zooming or resizing changes the pixel scale; panning keeps it, so the index is rebuilt only then.
+            if not np.array_equal(view_box.viewPixelSize(), self.point_index_scale):
+                self.index_points()
+            distance, nearest = self.point_index.query(np.array([point.x(), point.y()]) / self.point_index_scale,
+                                                       distance_upper_bound=HOVER_RADIUS_PX)
+            if np.isfinite(distance):
+                self.hover_text.setText(f"Broker: {self.plot_brokers[nearest]}")
+                self.hover_text.setPos(point)
+                return
             self.hover_text.setText("")
         except Exception:
             self.hover_text.setText("")
 
     @pyqtSlot(str)
     def show_error(self, message):
+        self.live_busy = False
+        if self.live_button.isChecked():
+            self.live_button.setChecked(False)
         self.start_button.setEnabled(True)
         self.fetch_button.setEnabled(True)
         self.status_bar.showMessage(f"Error: {message}", 5000)
@@ -300,6 +706,13 @@ class MainWindow(QMainWindow):
         else:
             QMessageBox.critical(self, "Error", message)
 
+    def closeEvent(self, event):
+        if self.analysis_engine is not None:
+            self.analysis_engine.cancel_run()
+            self.analysis_engine.compute_pool.shutdown()
+            self.analysis_engine.connections.close()
+        super().closeEvent(event)
+
     def apply_stylesheet(self):
         qss = """
             QWidget { background-color: #2E3440; color: #D8DEE9; font-size: 14px; }
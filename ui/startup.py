@@ -0,0 +1,32 @@
+# ui/startup.py
+# Background import of the analysis stack, so the main window can appear before it is loaded.
+
+import time
+import logging
+import importlib
+from PyQt6.QtCore import QObject, pyqtSignal
+
+# Imported in this order off the GUI thread; together they are most of a cold start.
+DEFERRED_MODULES = ['sklearn.cluster', 'sklearn.decomposition', 'sklearn.preprocessing', 'scipy.spatial',
+                    'influxdb_client', 'pyarrow.dataset', 'core.analysis_engine']
+
+class StartupLoader(QObject):
+    """
+    Imports DEFERRED_MODULES from a worker thread and reports the seconds each took. The signals are
+    delivered on the GUI thread, where the window then creates the analysis engine from the loaded modules.
+    """
+    loaded = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+
+    def load(self):
+        timings = {}
+        try:
+            for name in DEFERRED_MODULES:
+                started = time.perf_counter()
+                importlib.import_module(name)
+                timings[name] = time.perf_counter() - started
+        except Exception as e:
+            logging.error(f"Loading the analysis engine failed: {e}", exc_info=True)
+            self.failed.emit(str(e))
+            return
+        self.loaded.emit(timings)
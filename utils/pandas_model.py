@@ -1,17 +1,60 @@
 # utils/pandas_model.py
-# A QStandardItemModel subclass for displaying pandas DataFrames in a QTableView.
+# A lazy QAbstractTableModel for displaying pandas DataFrames in a QTableView.
 
-from PyQt6.QtGui import QStandardItemModel, QStandardItem
+import numpy as np
+import pandas as pd
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt
 
-class PandasModel(QStandardItemModel):
-    """A model to interface a Qt view with a pandas DataFrame."""
+class PandasModel(QAbstractTableModel):
+    """
+    A model to interface a Qt view with a pandas DataFrame.
+    Cells are formatted only when the view asks for them, so large frames load instantly.
+    """
     def __init__(self, data, parent=None):
         super().__init__(parent)
         self._data = data
-        self.setColumnCount(len(data.columns))
-        self.setRowCount(len(data))
-        self.setHorizontalHeaderLabels(data.columns)
+        self._headers = [str(col) for col in data.columns]
+        self._columns = [data[col].array for col in data.columns]
+        self._numeric = [pd.api.types.is_numeric_dtype(data[col]) for col in data.columns]
+        self._order = np.arange(len(data))
+        self._sort_keys = {}
 
-        for i, row in enumerate(data.itertuples(index=False)):
-            for j, val in enumerate(row):
-                self.setItem(i, j, QStandardItem(str(val)))
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._order)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._columns)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return str(self._columns[index.column()][self._order[index.row()]])
+        if role == Qt.ItemDataRole.TextAlignmentRole and self._numeric[index.column()]:
+            return int(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self._headers[section]
+        return str(section + 1)
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        """Reorders rows through a cached argsort of the column instead of touching the data."""
+        self.layoutAboutToBeChanged.emit()
+        if column < 0:
+            self._order = np.arange(len(self._data))
+        else:
+            if column not in self._sort_keys:
+                column_data = self._data.iloc[:, column].reset_index(drop=True)
+                self._sort_keys[column] = column_data.sort_values(kind='stable', na_position='last').index.to_numpy()
+            self._order = self._sort_keys[column]
+            if order == Qt.SortOrder.DescendingOrder:
+                self._order = self._order[::-1]
+        self.layoutChanged.emit()
+
+    def row_data(self, row):
+        """Returns the DataFrame row currently shown at view row `row`."""
+        return self._data.iloc[self._order[row]]